@@ -17,26 +17,74 @@ load_dotenv()
 PDL_API_KEY = os.environ.get("PEOPLE_API_KEY")
 PDL_API_URL = "https://api.peopledatalabs.com/v5/person/enrich"
 
-def enrich_persona_with_pdl(persona: Dict[str, Any]) -> Dict[str, Any]:
+# Identifiers that can produce a confident match on their own
+STRONG_PDL_IDENTIFIERS = ("email", "profile")
+# Otherwise this many weaker identifiers (name, location, company) are needed
+MIN_PDL_IDENTIFIERS = int(os.environ.get("PDL_MIN_IDENTIFIERS", "2"))
+
+# Values the persona prompt uses for unknown fields; they identify nobody
+PLACEHOLDER_VALUES = {"", "unknown", "n/a", "na", "none", "not specified", "unspecified", "not available"}
+
+def is_known_value(value: Any, username: Optional[str] = None) -> bool:
     """
-    Enrich persona data using the People Data Labs API.
+    Check whether a persona value can identify a person.
+    
+    Args:
+        value: Persona field value
+        username: Reddit username; a value equal to it is not a real name
+        
+    Returns:
+        False for empty values, placeholders such as "Unknown" and the username itself
+    """
+    if not value:
+        return False
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in PLACEHOLDER_VALUES or (username and text == username.lower()):
+            return False
+    return True
+
+def has_enough_for_pdl(params: Dict[str, Any], username: Optional[str] = None) -> bool:
+    """
+    Check whether PDL request parameters are likely to produce a match.
+    
+    Args:
+        params: Request parameters as returned by create_pdl_params
+        username: Reddit username, which does not count as a name
+        
+    Returns:
+        True if the request is worth making
+    """
+    identifiers = params.get("params") if params else None
+    if not identifiers:
+        return False
+    known = [key for key, value in identifiers.items() if is_known_value(value, username)]
+    if any(key in STRONG_PDL_IDENTIFIERS for key in known):
+        return True
+    return len(known) >= MIN_PDL_IDENTIFIERS
+
+def fetch_pdl_data(persona: Dict[str, Any], timeout: float = 15, username: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Look up a persona in the People Data Labs API.
     
     Args:
         persona: Dictionary containing person information
+        timeout: Seconds to wait for the PDL API before giving up
+        username: Reddit username the persona was built from
         
     Returns:
-        Enriched persona dictionary or original persona if enrichment fails
+        PDL API response data, or None if there is no key, too little to match on, or no match
     """
     if not PDL_API_KEY:
         print("People Data Labs API key not set. Skipping PDL enrichment.")
-        return persona
+        return None
     
     # Extract data from persona to use as search parameters
-    params = create_pdl_params(persona)
+    params = create_pdl_params(persona, username)
     
-    if not params or not params.get("params"):
+    if not has_enough_for_pdl(params, username):
         print("Insufficient data for PDL enrichment.")
-        return persona
+        return None
     
     try:
         # Make the API request
@@ -49,12 +97,12 @@ def enrich_persona_with_pdl(persona: Dict[str, Any]) -> Dict[str, Any]:
             PDL_API_URL,
             json=params,
             headers=headers,
-            timeout=15
+            timeout=timeout
         )
         
         if response.status_code != 200:
             print(f"PDL API error: {response.status_code} - {response.text}")
-            return persona
+            return None
         
         # Parse the response
         pdl_data = response.json()
@@ -62,40 +110,58 @@ def enrich_persona_with_pdl(persona: Dict[str, Any]) -> Dict[str, Any]:
         # Check if we got a valid match
         if not pdl_data.get("status") or pdl_data.get("status") != 200:
             print(f"PDL API returned no match: {pdl_data.get('status')}")
-            return persona
+            return None
         
-        # Enhance the persona with PDL data
-        enhanced_persona = enhance_persona_with_pdl_data(persona, pdl_data)
-        return enhanced_persona
+        return pdl_data
         
     except Exception as e:
         print(f"Error enriching with PDL: {e}")
+        return None
+
+def enrich_persona_with_pdl(persona: Dict[str, Any], timeout: float = 15, username: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Enrich persona data using the People Data Labs API.
+    
+    Args:
+        persona: Dictionary containing person information
+        timeout: Seconds to wait for the PDL API before giving up
+        username: Reddit username the persona was built from
+        
+    Returns:
+        Enriched persona dictionary or original persona if enrichment fails
+    """
+    pdl_data = fetch_pdl_data(persona, timeout, username)
+    if not pdl_data:
         return persona
+    
+    # Enhance the persona with PDL data
+    return enhance_persona_with_pdl_data(persona, pdl_data)
 
-def create_pdl_params(persona: Dict[str, Any]) -> Dict[str, Any]:
+def create_pdl_params(persona: Dict[str, Any], username: Optional[str] = None) -> Dict[str, Any]:
     """
     Create parameters for the PDL API request based on persona data.
     
     Args:
         persona: Dictionary containing person information
+        username: Reddit username; a name equal to it is left out
         
     Returns:
         Dictionary of parameters for the PDL API
     """
     params = {}
     
-    # Add name if available
-    if persona.get("name"):
+    # Add name if available (the persona falls back to the username when it has none)
+    if is_known_value(persona.get("name"), username):
         params["name"] = persona.get("name")
     
     # Add location if available
-    if persona.get("location"):
+    if is_known_value(persona.get("location")):
         params["location"] = persona.get("location")
     
     # Add company information if available
     if persona.get("company_industry") or persona.get("company"):
-        company = persona.get("company", "")
-        industry = persona.get("company_industry", "")
+        company = persona.get("company", "") if is_known_value(persona.get("company")) else ""
+        industry = persona.get("company_industry", "") if is_known_value(persona.get("company_industry")) else ""
         
         if company:
             params["company"] = company
@@ -117,7 +183,7 @@ def create_pdl_params(persona: Dict[str, Any]) -> Dict[str, Any]:
         params["profile"] = social_urls
     
     # Add email if available
-    if persona.get("email"):
+    if is_known_value(persona.get("email")):
         params["email"] = persona.get("email")
     
     # Return empty dict if we don't have enough info
@@ -4,18 +4,56 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_reddit_instance():
-    """Initializes and returns a PRAW instance for interacting with the Reddit API."""
+def _get_credentials():
     client_id = os.getenv("REDDIT_CLIENT_ID")
     client_secret = os.getenv("REDDIT_CLIENT_SECRET")
     user_agent = os.getenv("REDDIT_USER_AGENT")
 
     if not all([client_id, client_secret, user_agent]):
         raise ValueError("Reddit API credentials not found in .env file.")
+    return client_id, client_secret, user_agent
+
+def get_reddit_instance(timeout=None):
+    """
+    Initializes and returns a PRAW instance for interacting with the Reddit API.
+    timeout (seconds), if given, bounds each HTTP request made by the instance.
+    """
+    client_id, client_secret, user_agent = _get_credentials()
+
+    options = {}
+    if timeout is not None:
+        options["timeout"] = max(1, int(timeout))
 
     reddit = praw.Reddit(
         client_id=client_id,
         client_secret=client_secret,
         user_agent=user_agent,
+        **options,
+    )
+    return reddit
+
+def get_async_reddit_instance(max_connections=100, timeout=None):
+    """
+    Initializes and returns an Async PRAW instance backed by a single aiohttp
+    connection pool of at most max_connections connections.
+    Must be called from a running event loop; close it with `await reddit.close()`.
+    """
+    # Batch-only dependencies; the synchronous app path does not need them
+    import aiohttp
+    import asyncpraw
+
+    client_id, client_secret, user_agent = _get_credentials()
+
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_connections))
+    options = {}
+    if timeout is not None:
+        options["timeout"] = max(1, int(timeout))
+
+    reddit = asyncpraw.Reddit(
+        client_id=client_id,
+        client_secret=client_secret,
+        user_agent=user_agent,
+        requestor_kwargs={"session": session},
+        **options,
     )
     return reddit
@@ -1,13 +1,15 @@
 import streamlit as st
 import json
 import re
-import matplotlib.pyplot as plt
+import pandas as pd
 from PIL import Image
 Image.MAX_IMAGE_PIXELS = None
 import html
-from core.reddit_scraper import get_user_data
-from core.persona_generator import generate_persona
-from core.topic_modeling import get_topic_distribution
+from core.pipeline import apply_finished_enrichment, get_or_run_pipeline
+from core.enrichment import enrichment_status
+from core.persona_schema import get_repair_stats
+from core.cache_warmer import start_cache_warmer
+from core.raw_data_view import MAIN_VIEW_BODY_CHARS, date_range, filter_items, page_count, page_rows, profile_summary, truncate_text
 
 # --- Custom CSS for Enhanced Section Division and Visuals ---
 st.markdown("""
@@ -158,8 +160,14 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.set_page_config(page_title="Reddit User Persona Generator", layout="wide")
+# Keeps the watch-list (WATCHLIST / WATCHLIST_PATH) warm; started once per process
+start_cache_warmer()
 st.title("Reddit User Persona Generator")
 
+with st.sidebar.expander("Persona parsing stats"):
+    st.caption("How often Gemini's persona output parsed clean, was repaired locally, needed a field re-prompt or failed, since the server started.")
+    st.json(get_repair_stats())
+
 url = st.text_input("Enter a Reddit profile URL:")
 
 def get_username_from_url(url):
@@ -168,182 +176,298 @@ def get_username_from_url(url):
         return match.group(1)
     return None
 
+STAGE_LABELS = {
+    "scrape": "Reddit data",
+    "persona": "Persona",
+    "enrichment": "People Data Labs enrichment",
+    "topics": "Topic analysis",
+}
+
+def render_missing(result, stage, state="unavailable"):
+    """Marks a section whose pipeline stage did not finish in time or failed."""
+    message = result["errors"].get(stage, "not run")
+    st.info(f"{STAGE_LABELS[stage]} {state} ({result['status'].get(stage)}): {message}")
+
+@st.cache_data(max_entries=256)
+def topic_chart_data(username, topic_model_version, topic_counts):
+    """Chart data for a user's topic counts, cached per user and topic model version."""
+    return pd.DataFrame(
+        {"Number of Comments": [count for _, _, count in topic_counts]},
+        index=pd.Index([name for _, name, _ in topic_counts], name="Topic"),
+    )
+
+def render_enrichment(added):
+    """Shows the persona fields filled in by People Data Labs."""
+    st.markdown('<div class="section-block">', unsafe_allow_html=True)
+    st.markdown('<div class="section-title">Profile Enrichment</div>', unsafe_allow_html=True)
+    for field, value in added.items():
+        label = field.replace("_", " ").title()
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            st.markdown(f"**{label}**")
+            st.dataframe(value, hide_index=True)
+        elif isinstance(value, list):
+            st.markdown(f"**{label}**: {', '.join(str(v) for v in value)}")
+        else:
+            st.markdown(f"**{label}**: {value}")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def enrichment_text(added):
+    """Plain-text version of render_enrichment for the persona download."""
+    lines = ["", "--- Profile Enrichment ---"]
+    for field, value in added.items():
+        label = field.replace("_", " ").title()
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            lines.append(f"{label}:")
+            lines += [f"- {', '.join(str(v) for v in entry.values() if v)}" for entry in value]
+        elif isinstance(value, list):
+            lines.append(f"{label}: {', '.join(str(v) for v in value)}")
+        else:
+            lines.append(f"{label}: {value}")
+    return "\n".join(lines) + "\n"
+
+# Seconds between checks for a finished background PDL lookup
+ENRICHMENT_POLL_SECONDS = 2
+
+@st.fragment(run_every=ENRICHMENT_POLL_SECONDS)
+def poll_enrichment(username):
+    """While the PDL lookup runs, checks on it and reruns the page once it finishes."""
+    if enrichment_status(username) == "pending":
+        st.caption("Profile enrichment is still running; it will appear here when it finishes.")
+    else:
+        st.rerun()
+
+@st.fragment
+def render_raw_data(user_data):
+    """
+    Paged, filterable view of the scraped items. Only the current page is sent to
+    the browser, and filter or page changes rerun just this fragment.
+    """
+    st.json(profile_summary(user_data), expanded=False)
+    kind = st.radio("Items", ["Comments", "Submissions"], horizontal=True)
+    items = user_data["comments" if kind == "Comments" else "submissions"]
+    if not items:
+        st.caption(f"No {kind.lower()} scraped.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    subreddit = col1.selectbox("Subreddit", ["All", *sorted({item["subreddit"] for item in items})])
+    min_score = col2.number_input("Minimum score", value=None, step=1)
+    first, last = date_range(items)
+    dates = col3.date_input("Posted between (UTC)", value=(first, last), min_value=first, max_value=last)
+
+    filtered = filter_items(
+        items,
+        subreddit=None if subreddit == "All" else subreddit,
+        min_score=min_score,
+        start_date=dates[0] if dates else None,
+        end_date=dates[1] if len(dates) > 1 else None,
+    )
+    pages = page_count(len(filtered))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+    st.caption(f"{len(filtered)} of {len(items)} {kind.lower()} match")
+    st.dataframe(page_rows(filtered, page), hide_index=True)
+
 if st.button("Generate Persona"):
     if url:
         username = get_username_from_url(url)
         if username:
-            with st.spinner(f"Scraping data for u/{username}..."):
-                user_data = get_user_data(username)
-            
-
-            if user_data:
-                st.success(f"Successfully scraped data for u/{username}.")
-                with st.spinner("Generating persona..."):
-                    persona = generate_persona(user_data.copy())
-
-                if persona and "error" in persona:
-                    st.error(f"Error generating persona: {persona['error']}")
-                elif persona:
-                    # --- Persona Header Card ---
-                    st.markdown(
-                        (
-                            '<div class="persona-header">'
-                            f'<h2 style="margin-bottom:10px;">{persona.get("name", username)}</h2>'
-                            '<div style="display:flex; align-items:flex-start; gap: 40px;">'
-                                '<div style="flex-shrink: 0;">'
-                                    f'{f"""<img src="{persona.get("profile_picture", user_data.get("profile_img", ""))}" style="width: 200px; height: 200px; border-radius: 50%; object-fit: cover; border: 3px solid #f8b500;" />""" if persona.get("profile_picture") or user_data.get("profile_img") else ""}'
-                                '</div>'
-                                '<div style="flex:1; padding-top: 30px;">'
-                                    '<table class="info-table">'
-                                        f'<tr><td><strong>Age</strong></td><td>{persona.get("age", "N/A")}</td></tr>'
-                                        f'<tr><td><strong>Occupation</strong></td><td>{persona.get("occupation", "N/A")}</td></tr>'
-                                        f'<tr><td><strong>Status</strong></td><td>{persona.get("status", "N/A")}</td></tr>'
-                                        f'<tr><td><strong>Location</strong></td><td>{persona.get("location", "N/A")}</td></tr>'
-                                        f'<tr><td><strong>Comment Karma</strong></td><td>{persona.get("comment_karma", "N/A")}</td></tr>'
-                                        f'<tr><td><strong>Link Karma</strong></td><td>{persona.get("link_karma", "N/A")}</td></tr>'
-                                    '</table>'
-                                '</div>'
-                            '</div>'
-                            f'{f"""<div class="persona-quote">"{html.escape(persona.get("summary_quote", ""))}"</div>""" if persona.get("summary_quote") else ""}'
-                            '<div style="display:flex; justify-content:space-around; margin-top: 30px;">'
-                                '<div style="flex:1; padding-right: 10px;">'
-                                    '<div class="section-title" style="color: black;">Motivations</div>'
-                                    '<div style="text-align:left; padding-left:10px;">'
-                                    + ''.join([
-                                        '<div class="degree-display-group">'
-                                        f'<span class="motivation-badge">{item.get("motivation", "")}</span>'
-                                        '<span class="degree-label-side">1</span>'
-                                        f'<div class="degree-scale-container"><div class="degree-scale-fill" style="width: {item.get("degree", 0) * 10}%;"></div></div>'
-                                        '<span class="degree-label-side">10</span>'
-                                        '</div>'
-                                        + (
-                                            ''.join([
-                                                f'<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{html.escape(citation)}"</div>'
-                                                for citation in item.get("citations", [])
-                                            ]) if item.get("citations") else ''
-                                        )
-                                        for item in persona.get("motivations", [])
-                                    ])
-                                    + '</div>'
-                                '</div>'
-                                '<div style="flex:1; padding-left: 10px;">'
-                                    '<div class="section-title" style="color: black;">Personality Traits</div>'
-                                    '<div style="text-align:left; padding-left:10px;">'
-                                    + ''.join([
-                                        '<div class="degree-display-group">'
-                                        f'<span class="trait-badge">{item.get("trait", "")}</span>'
-                                        '<span class="degree-label-side">1</span>'
-                                        f'<div class="degree-scale-container"><div class="degree-scale-fill" style="width: {item.get("degree", 0) * 10}%;"></div></div>'
-                                        '<span class="degree-label-side">10</span>'
-                                        '</div>'
-                                        + (
-                                            ''.join([
-                                                f'<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{html.escape(citation)}"</div>'
-                                                for citation in item.get("citations", [])
-                                            ]) if item.get("citations") else ''
-                                        )
-                                        for item in persona.get("personality_traits", [])
-                                    ])
-                                    + '</div>'
+            with st.spinner(f"Building persona for u/{username}..."):
+                st.session_state["result"] = get_or_run_pipeline(username)
+            st.session_state["persona_saved"] = None
+        else:
+            st.session_state.pop("result", None)
+            st.warning("Please enter a valid Reddit profile URL.")
+    else:
+        st.session_state.pop("result", None)
+        st.warning("Please enter a Reddit profile URL.")
+
+# The result lives in session state so reruns triggered by other widgets
+# (download button, expanders) redraw it without calling the pipeline again.
+result = st.session_state.get("result")
+if result:
+    username = result["username"]
+    result = st.session_state["result"] = apply_finished_enrichment(result)
+    user_data = result["user_data"]
+    persona = result["persona"]
+
+    if user_data:
+        if result["status"]["scrape"] == "ok":
+            st.success(f"Successfully scraped data for u/{username}.")
+        else:
+            render_missing(result, "scrape", "incomplete")
+        if persona:
+            # --- Persona Header Card ---
+            st.markdown(
+                (
+                    '<div class="persona-header">'
+                    f'<h2 style="margin-bottom:10px;">{persona.get("name", username)}</h2>'
+                    '<div style="display:flex; align-items:flex-start; gap: 40px;">'
+                        '<div style="flex-shrink: 0;">'
+                            f'{f"""<img src="{persona.get("profile_picture", user_data.get("profile_img", ""))}" style="width: 200px; height: 200px; border-radius: 50%; object-fit: cover; border: 3px solid #f8b500;" />""" if persona.get("profile_picture") or user_data.get("profile_img") else ""}'
+                        '</div>'
+                        '<div style="flex:1; padding-top: 30px;">'
+                            '<table class="info-table">'
+                                f'<tr><td><strong>Age</strong></td><td>{persona.get("age", "N/A")}</td></tr>'
+                                f'<tr><td><strong>Occupation</strong></td><td>{persona.get("occupation", "N/A")}</td></tr>'
+                                f'<tr><td><strong>Status</strong></td><td>{persona.get("status", "N/A")}</td></tr>'
+                                f'<tr><td><strong>Location</strong></td><td>{persona.get("location", "N/A")}</td></tr>'
+                                f'<tr><td><strong>Comment Karma</strong></td><td>{persona.get("comment_karma", "N/A")}</td></tr>'
+                                f'<tr><td><strong>Link Karma</strong></td><td>{persona.get("link_karma", "N/A")}</td></tr>'
+                            '</table>'
+                        '</div>'
+                    '</div>'
+                    f'{f"""<div class="persona-quote">"{html.escape(persona.get("summary_quote", ""))}"</div>""" if persona.get("summary_quote") else ""}'
+                    '<div style="display:flex; justify-content:space-around; margin-top: 30px;">'
+                        '<div style="flex:1; padding-right: 10px;">'
+                            '<div class="section-title" style="color: black;">Motivations</div>'
+                            '<div style="text-align:left; padding-left:10px;">'
+                            + ''.join([
+                                '<div class="degree-display-group">'
+                                f'<span class="motivation-badge">{item.get("motivation", "")}</span>'
+                                '<span class="degree-label-side">1</span>'
+                                f'<div class="degree-scale-container"><div class="degree-scale-fill" style="width: {item.get("degree", 0) * 10}%;"></div></div>'
+                                '<span class="degree-label-side">10</span>'
                                 '</div>'
-                            '</div>'
-                            '<div style="display:flex; justify-content:space-around; margin-top: 30px;">'
-                                '<div style="flex:1; padding-right: 10px;">'
-                                    '<div class="section-title" style="color: black;">Active Subreddits</div>'
-                                    + ''.join([f'<span class="subreddit-pill">r/{sr}</span>' for sr in persona.get("subreddits_active", [])])
-                                + '</div>'
-                                '<div style="flex:1; padding-left: 10px;">'
-                                    '<div class="section-title" style="color: black;">Sentiment & Tone</div>'
-                                    f'<span class="sentiment-pill">{persona.get("sentiment_tone", "N/A")}</span>'
+                                + (
+                                    ''.join([
+                                        f'<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{html.escape(citation)}"</div>'
+                                        for citation in item.get("citations", [])
+                                    ]) if item.get("citations") else ''
+                                )
+                                for item in persona.get("motivations", [])
+                            ])
+                            + '</div>'
+                        '</div>'
+                        '<div style="flex:1; padding-left: 10px;">'
+                            '<div class="section-title" style="color: black;">Personality Traits</div>'
+                            '<div style="text-align:left; padding-left:10px;">'
+                            + ''.join([
+                                '<div class="degree-display-group">'
+                                f'<span class="trait-badge">{item.get("trait", "")}</span>'
+                                '<span class="degree-label-side">1</span>'
+                                f'<div class="degree-scale-container"><div class="degree-scale-fill" style="width: {item.get("degree", 0) * 10}%;"></div></div>'
+                                '<span class="degree-label-side">10</span>'
                                 '</div>'
-                            '</div>'
-                            '</div>'
-                            '<hr class="section-divider">'
-                        ),
-                        unsafe_allow_html=True
-                    )
-
-                    # --- Summary Quote ---
-                    if persona.get('summary_quote'):
-                        st.markdown(f'''<div class="persona-quote">"{persona["summary_quote"]}"</div>''', unsafe_allow_html=True)
-
-                    # --- Section Blocks with Clear Divisions ---
-                    st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                    st.markdown('<div class="section-title">Behaviour & Habits</div>', unsafe_allow_html=True)
-                    st.markdown("<ul>" + "".join([
-                        f"<li>{item.get('habit', '')}" +
-                        ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
-                        "</li>" for item in persona.get("behaviour_habits", [])
-                    ]) + "</ul>", unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                    st.markdown('<div class="section-title">Frustrations</div>', unsafe_allow_html=True)
-                    st.markdown("<ul>" + "".join([
-                        f"<li>{item.get('frustration', '')}" +
-                        ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
-                        "</li>" for item in persona.get("frustrations", [])
-                    ]) + "</ul>", unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                    st.markdown('<div class="section-title">Goals & Needs</div>', unsafe_allow_html=True)
-                    st.markdown("<ul>" + "".join([
-                        f"<li>{item.get('goal_need', '')}" +
-                        ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
-                        "</li>" for item in persona.get("goals_needs", [])
-                    ]) + "</ul>", unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    # --- Top Comments and Submissions ---
-                    if user_data.get('top_comments'):
-                        st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                        st.markdown('<div class="section-title">Top Comment</div>', unsafe_allow_html=True)
-                        comment = user_data['top_comments'][0]
-                        st.markdown(f"<p><b>r/{comment['subreddit']}</b> (+{comment['score']})</p><blockquote>{comment['body']}</blockquote>", unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-
-                    if user_data.get('top_submissions'):
-                        st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                        st.markdown('<div class="section-title">Top Submission</div>', unsafe_allow_html=True)
-                        submission = user_data['top_submissions'][0]
-                        st.markdown(f"<p><b>r/{submission['subreddit']}</b> (+{submission['score']})</p><h5>{submission['title']}</h5><blockquote>{submission['selftext']}</blockquote>", unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                                        # --- Topic Modeling ---
-                    with st.spinner("Analyzing comment topics..."):
-                        topic_info, topic_distr = get_topic_distribution(user_data['comments'])
-
-                    if topic_info is not None and topic_distr is not None:
-                        st.markdown('<div class="section-block">', unsafe_allow_html=True)
-                        st.markdown('<div class="section-title">Comment Topic Distribution</div>', unsafe_allow_html=True)
-                        
-                        # Create a bar chart
-                        fig, ax = plt.subplots(figsize=(12, 7), dpi=200)
-                        topic_counts = topic_distr['Topic'].value_counts().sort_index()
-                        
-                        # Get topic names from topic_info
-                        topic_names = {row['Topic']: row['Name'] for index, row in topic_info.iterrows()}
-                        
-                        # Map topic IDs to names for plotting
-                        labels = [topic_names.get(t, f"Topic {t}") for t in topic_counts.index]
-
-                        ax.bar(labels, topic_counts.values, width=0.4, color='#f8b500')
-                        ax.set_xlabel("Topic", fontsize=10)
-                        ax.set_ylabel("Number of Comments", fontsize=10)
-                        ax.set_title("Comment Distribution by Topic", fontsize=12)
-                        plt.xticks(rotation=45, ha='right', fontsize=8)
-                        plt.yticks(fontsize=8)
-                        plt.tight_layout(pad=3.0)
-                        st.pyplot(fig)
-
-                        st.markdown('</div>', unsafe_allow_html=True)
-
-
-                    st.markdown("---")
-                    
-                    # Prepare persona for download
-                    persona_text_content = f"""
+                                + (
+                                    ''.join([
+                                        f'<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{html.escape(citation)}"</div>'
+                                        for citation in item.get("citations", [])
+                                    ]) if item.get("citations") else ''
+                                )
+                                for item in persona.get("personality_traits", [])
+                            ])
+                            + '</div>'
+                        '</div>'
+                    '</div>'
+                    '<div style="display:flex; justify-content:space-around; margin-top: 30px;">'
+                        '<div style="flex:1; padding-right: 10px;">'
+                            '<div class="section-title" style="color: black;">Active Subreddits</div>'
+                            + ''.join([f'<span class="subreddit-pill">r/{sr}</span>' for sr in persona.get("subreddits_active", [])])
+                        + '</div>'
+                        '<div style="flex:1; padding-left: 10px;">'
+                            '<div class="section-title" style="color: black;">Sentiment & Tone</div>'
+                            f'<span class="sentiment-pill">{persona.get("sentiment_tone", "N/A")}</span>'
+                        '</div>'
+                    '</div>'
+                    '</div>'
+                    '<hr class="section-divider">'
+                ),
+                unsafe_allow_html=True
+            )
+
+            # --- Summary Quote ---
+            if persona.get('summary_quote'):
+                st.markdown(f'''<div class="persona-quote">"{persona["summary_quote"]}"</div>''', unsafe_allow_html=True)
+
+            # --- Section Blocks with Clear Divisions ---
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Behaviour & Habits</div>', unsafe_allow_html=True)
+            st.markdown("<ul>" + "".join([
+                f"<li>{item.get('habit', '')}" +
+                ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
+                "</li>" for item in persona.get("behaviour_habits", [])
+            ]) + "</ul>", unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Frustrations</div>', unsafe_allow_html=True)
+            st.markdown("<ul>" + "".join([
+                f"<li>{item.get('frustration', '')}" +
+                ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
+                "</li>" for item in persona.get("frustrations", [])
+            ]) + "</ul>", unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Goals & Needs</div>', unsafe_allow_html=True)
+            st.markdown("<ul>" + "".join([
+                f"<li>{item.get('goal_need', '')}" +
+                ("".join([f'''<div style="font-size:0.85rem; color:#666; margin-left:10px; font-style:italic;">"{citation}"</div>''' for citation in item.get('citations', [])]) if item.get('citations') else '') +
+                "</li>" for item in persona.get("goals_needs", [])
+            ]) + "</ul>", unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+        else:
+            render_missing(result, "persona")
+
+        # --- Activity Patterns ---
+        features = user_data.get('activity_features')
+        if features:
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Activity Patterns</div>', unsafe_allow_html=True)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Reply ratio", f"{features['reply_ratio']:.0%}")
+            col2.metric("Median comment score", features['comment_scores']['median'])
+            col3.metric("Peak hour (UTC)", f"{features['peak_hour_utc']}:00" if features['peak_hour_utc'] is not None else "N/A")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.caption("Activity by hour of day (UTC)")
+                st.bar_chart(pd.DataFrame({"Items": features['hour_of_day']}), color='#f8b500')
+            with col2:
+                st.caption("Activity by day of week")
+                st.bar_chart(pd.Series(features['day_of_week'], name="Items"), color='#f8b500')
+            if features['subreddit_counts']:
+                st.caption("Most active subreddits")
+                st.bar_chart(pd.Series(features['subreddit_counts'], name="Items"), color='#f8b500')
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        # --- Top Comments and Submissions ---
+        if user_data.get('top_comments'):
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Top Comment</div>', unsafe_allow_html=True)
+            comment = user_data['top_comments'][0]
+            st.markdown(f"<p><b>r/{comment['subreddit']}</b> (+{comment['score']})</p><blockquote>{truncate_text(comment['body'], MAIN_VIEW_BODY_CHARS)}</blockquote>", unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        if user_data.get('top_submissions'):
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Top Submission</div>', unsafe_allow_html=True)
+            submission = user_data['top_submissions'][0]
+            st.markdown(f"<p><b>r/{submission['subreddit']}</b> (+{submission['score']})</p><h5>{submission['title']}</h5><blockquote>{truncate_text(submission['selftext'], MAIN_VIEW_BODY_CHARS)}</blockquote>", unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        # --- Topic Modeling ---
+        if result["topic_counts"]:
+            st.markdown('<div class="section-block">', unsafe_allow_html=True)
+            st.markdown('<div class="section-title">Comment Topic Distribution</div>', unsafe_allow_html=True)
+            st.bar_chart(
+                topic_chart_data(username, result["topic_model_version"], result["topic_counts"]),
+                x_label="Topic", y_label="Number of Comments", color='#f8b500',
+            )
+            st.markdown('</div>', unsafe_allow_html=True)
+        elif result["status"]["topics"] != "ok":
+            render_missing(result, "topics")
+
+        # --- Profile Enrichment (merged in when the background lookup finishes) ---
+        if result.get("enrichment_added"):
+            render_enrichment(result["enrichment_added"])
+        elif persona and result["status"]["enrichment"] == "pending":
+            poll_enrichment(username)
+
+        st.markdown("---")
+
+        if persona:
+            # Prepare persona for download
+            persona_text_content = f"""
 User Persona for {persona.get('name', username)}
 
 --- Basic Information ---
@@ -378,28 +502,29 @@ Link Karma: {persona.get('link_karma', 'N/A')}
 --- Goals & Needs ---
 {chr(10).join([f'- {item.get('goal_need', '')}' + (chr(10) + chr(10).join([f'  > "{html.escape(citation)}"' for citation in item.get('citations', [])]) if item.get('citations') else '') for item in persona.get('goals_needs', [])])}
 """
-                    st.download_button(
-                        label="Download Persona as Text",
-                        data=persona_text_content,
-                        file_name=f"{username}_persona.txt",
-                        mime="text/plain"
-                    )
-
-                    # Save persona to a text file in the current directory
-                    try:
-                        file_path = f"{username}_persona.txt"
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(persona_text_content)
-                        st.success(f"Persona saved to {file_path}")
-                    except Exception as e:
-                        st.error(f"Error saving persona to file: {e}")
-
-                    with st.expander("View Raw Data"):
-                        st.json(user_data)
-            else:
-                st.warning("Could not retrieve data for this user.")
-        else:
-            st.warning("Please enter a valid Reddit profile URL.")
-    else:
-        st.warning("Please enter a Reddit profile URL.")
+            if result.get("enrichment_added"):
+                persona_text_content += enrichment_text(result["enrichment_added"])
+            st.download_button(
+                label="Download Persona as Text",
+                data=persona_text_content,
+                file_name=f"{username}_persona.txt",
+                mime="text/plain"
+            )
 
+            # Save persona to a text file in the current directory, once per generated
+            # result and again when background enrichment adds to it
+            saved_version = (username, result["status"]["enrichment"])
+            if st.session_state.get("persona_saved") != saved_version:
+                try:
+                    file_path = f"{username}_persona.txt"
+                    with open(file_path, "w", encoding="utf-8") as f:
+                        f.write(persona_text_content)
+                    st.session_state["persona_saved"] = saved_version
+                    st.success(f"Persona saved to {file_path}")
+                except Exception as e:
+                    st.error(f"Error saving persona to file: {e}")
+
+        with st.expander("View Raw Data"):
+            render_raw_data(user_data)
+    else:
+        st.warning(f"Could not retrieve data for this user: {result['errors'].get('scrape', '')}")
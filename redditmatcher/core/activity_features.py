@@ -0,0 +1,100 @@
+import time
+import numpy as np
+
+SECONDS_PER_WEEK = 7 * 24 * 3600
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def top_indices(scores, k=3):
+    """Returns the indices of the k highest scores, best first, without sorting the whole array."""
+    scores = np.asarray(scores)
+    if scores.size == 0:
+        return []
+    k = min(k, scores.size)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+def posts_per_week(created_utc, now=None):
+    """Average number of items per week between the oldest item and now."""
+    created_utc = np.asarray(created_utc, dtype=np.float64)
+    if created_utc.size == 0:
+        return 0
+    now = time.time() if now is None else now
+    time_span_weeks = (now - created_utc.min()) / SECONDS_PER_WEEK
+    return float(created_utc.size / time_span_weeks) if time_span_weeks > 0 else 0
+
+def _score_stats(scores):
+    if scores.size == 0:
+        return {"count": 0, "mean": 0, "median": 0, "p90": 0, "max": 0, "min": 0}
+    p50, p90 = np.percentile(scores, [50, 90])
+    return {
+        "count": int(scores.size),
+        "mean": round(float(scores.mean()), 2),
+        "median": round(float(p50), 2),
+        "p90": round(float(p90), 2),
+        "max": int(scores.max()),
+        "min": int(scores.min()),
+    }
+
+def compute_activity_features(comments, submissions, now=None, top_subreddits=10):
+    """
+    Computes compact activity features over scraped comments and submissions in one vectorized pass.
+    Args:
+        comments (list of dict): each with 'score', 'subreddit', 'created_utc' and optionally 'is_reply'
+        submissions (list of dict): each with 'score', 'subreddit', 'created_utc'
+    Returns:
+        dict of JSON-serializable features (subreddit histogram, hour-of-day and
+        day-of-week activity, score distributions, reply ratio, posting rate)
+    """
+    n_comments = len(comments)
+    items = comments + submissions
+    created = np.fromiter((item["created_utc"] for item in items), dtype=np.float64, count=len(items))
+    scores = np.fromiter((item["score"] for item in items), dtype=np.int64, count=len(items))
+    is_reply = np.fromiter((bool(c.get("is_reply")) for c in comments), dtype=bool, count=n_comments)
+
+    # Subreddit frequency histogram, most active first
+    subreddit_counts = {}
+    if items:
+        names, counts = np.unique([item["subreddit"] for item in items], return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:top_subreddits]
+        subreddit_counts = {str(names[i]): int(counts[i]) for i in order}
+
+    # Activity by UTC hour of day and day of week (1970-01-01 was a Thursday)
+    hours = (created // 3600 % 24).astype(np.int64)
+    days = ((created // 86400 + 3) % 7).astype(np.int64)
+    hour_of_day = np.bincount(hours, minlength=24)
+    day_of_week = np.bincount(days, minlength=7)
+
+    replies = int(is_reply.sum())
+    return {
+        "subreddit_counts": subreddit_counts,
+        "hour_of_day": hour_of_day.tolist(),
+        "day_of_week": dict(zip(DAY_NAMES, day_of_week.tolist())),
+        "peak_hour_utc": int(hour_of_day.argmax()) if items else None,
+        "comment_scores": _score_stats(scores[:n_comments]),
+        "submission_scores": _score_stats(scores[n_comments:]),
+        "reply_count": replies,
+        "top_level_count": n_comments - replies,
+        "reply_ratio": round(replies / n_comments, 3) if n_comments else 0,
+        "posts_per_week": {
+            "comments": posts_per_week(created[:n_comments], now),
+            "submissions": posts_per_week(created[n_comments:], now),
+        },
+    }
+
+def format_activity_features(features):
+    """Renders activity features as a few compact lines for an LLM prompt."""
+    if not features:
+        return "n/a"
+    subreddits = ", ".join(f"r/{name} ({count})" for name, count in features["subreddit_counts"].items())
+    days = ", ".join(f"{day} {count}" for day, count in features["day_of_week"].items())
+    peak_hour = "n/a" if features["peak_hour_utc"] is None else f"{features['peak_hour_utc']}:00"
+    comment_scores = features["comment_scores"]
+    submission_scores = features["submission_scores"]
+    return "\n".join([
+        f"  - Subreddit activity (items): {subreddits or 'none'}",
+        f"  - Activity by UTC hour (00-23): {features['hour_of_day']} (peak {peak_hour})",
+        f"  - Activity by weekday: {days}",
+        f"  - Comment scores: mean {comment_scores['mean']}, median {comment_scores['median']}, p90 {comment_scores['p90']}, max {comment_scores['max']}",
+        f"  - Submission scores: mean {submission_scores['mean']}, median {submission_scores['median']}, p90 {submission_scores['p90']}, max {submission_scores['max']}",
+        f"  - Replies vs top-level comments: {features['reply_count']} / {features['top_level_count']} (reply ratio {features['reply_ratio']})",
+    ])
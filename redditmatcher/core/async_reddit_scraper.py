@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+from api.reddit_api import get_async_reddit_instance
+from core.reddit_scraper import FETCH_LIMIT, comment_to_dict, finalize_user_data, new_user_data, submission_to_dict
+from core.text_store import compact_user_data
+
+load_dotenv()
+
+# Maximum number of users scraped at the same time over the shared client
+ASYNC_SCRAPE_CONCURRENCY = int(os.getenv("ASYNC_SCRAPE_CONCURRENCY", "50"))
+
+async def get_user_data_async(reddit, username, deadline=None):
+    """
+    Async counterpart of core.reddit_scraper.get_user_data using a shared Async PRAW client.
+    Returns the same dict shape, or None if the user could not be scraped.
+    """
+    try:
+        redditor = await reddit.redditor(username, fetch=True)
+        data = new_user_data(redditor)
+
+        async def fetch(listing, to_dict, kind):
+            items = []
+            try:
+                async for item in listing.new(limit=FETCH_LIMIT):
+                    if deadline and time.time() > deadline:
+                        print(f"Scrape deadline reached for u/{username} after {len(items)} {kind}")
+                        data["truncated"] = True
+                        break
+                    items.append(to_dict(item))
+            except Exception as e:
+                print(f"Error fetching {kind} for u/{username}: {e}")
+            return items
+
+        # Comments and submissions are separate listings, so page through both at once
+        all_comments, all_submissions = await asyncio.gather(
+            fetch(redditor.comments, comment_to_dict, "comments"),
+            fetch(redditor.submissions, submission_to_dict, "submissions"),
+        )
+        return finalize_user_data(data, all_comments, all_submissions)
+
+    except Exception as e:
+        print(f"An error occurred while scraping data for u/{username}: {e}")
+        return None
+
+async def get_users_data_async(usernames, concurrency=None, deadline=None, reddit=None, store=None):
+    """
+    Scrapes many users concurrently over one client and connection pool.
+    Args:
+        usernames (list of str): users to scrape
+        concurrency (int): maximum users in flight (default ASYNC_SCRAPE_CONCURRENCY)
+        deadline (float): optional time.time() timestamp after which paging stops
+        reddit: an existing Async PRAW instance to reuse; one is created and closed otherwise
+        store (TextStore): if given, items are returned as compact records whose
+            texts are deduplicated in this store (see core.text_store)
+    Returns:
+        dict mapping each username to its user data dict (or None on failure)
+    """
+    concurrency = concurrency or ASYNC_SCRAPE_CONCURRENCY
+    owns_client = reddit is None
+    if owns_client:
+        reddit = get_async_reddit_instance(max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def scrape(username):
+        async with semaphore:
+            data = await get_user_data_async(reddit, username, deadline)
+        return compact_user_data(data, store) if data is not None and store is not None else data
+
+    try:
+        results = await asyncio.gather(*(scrape(username) for username in usernames))
+    finally:
+        if owns_client:
+            await reddit.close()
+    return dict(zip(usernames, results))
+
+def get_users_data(usernames, concurrency=None, deadline=None, store=None):
+    """
+    Synchronous entry point for batch callers; see get_users_data_async.
+    Items are plain dicts unless a store (e.g. core.text_store.TEXT_STORE) is given.
+    """
+    return asyncio.run(get_users_data_async(usernames, concurrency, deadline, store=store))
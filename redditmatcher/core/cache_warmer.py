@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from core.pipeline import get_or_run_pipeline
+from core.result_cache import cache_times, get_request_counts, is_complete
+
+load_dotenv()
+
+# Users to keep warm: a comma-separated list and/or a file with one username per line
+WATCHLIST = os.getenv("WATCHLIST", "")
+WATCHLIST_PATH = os.getenv("WATCHLIST_PATH")
+# A cached result is refreshed once this share of its lifetime is left
+REFRESH_AHEAD_FRACTION = float(os.getenv("REFRESH_AHEAD_FRACTION", "0.2"))
+# Minimum seconds between two refreshes, so the warmer stays within Reddit and Gemini quotas
+WARM_SPACING = float(os.getenv("WARM_SPACING", "30"))
+# Seconds to wait before retrying a user whose refresh failed or left a stage unfinished;
+# doubled after each further incomplete refresh, up to WARM_MAX_RETRY_DELAY
+WARM_RETRY_DELAY = float(os.getenv("WARM_RETRY_DELAY", "600"))
+WARM_MAX_RETRY_DELAY = float(os.getenv("WARM_MAX_RETRY_DELAY", "21600"))
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+def load_watchlist(names=None, path=None):
+    """
+    Returns the watch-list usernames, without duplicates, in the order given.
+    Reads WATCHLIST and WATCHLIST_PATH unless names or path are passed.
+    Lines starting with '#' in the file are ignored.
+    """
+    names = WATCHLIST if names is None else names
+    path = WATCHLIST_PATH if path is None else path
+    usernames = [name.strip() for name in names.split(",")]
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                usernames += [line.strip() for line in f if not line.lstrip().startswith("#")]
+        except OSError as e:
+            print(f"Error reading watch-list {path}: {e}")
+    watchlist, seen = [], set()
+    for name in usernames:
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            watchlist.append(name)
+    return watchlist
+
+def refresh_due_at(username):
+    """Returns when a user's cached result should be refreshed (0 if nothing is cached)."""
+    times = cache_times(username)
+    if times is None:
+        return 0
+    stored_at, expires_at = times
+    return expires_at - (expires_at - stored_at) * REFRESH_AHEAD_FRACTION
+
+class CacheWarmer(threading.Thread):
+    """
+    Refreshes the cached pipeline results of a watch-list before they expire.
+    Each refresh re-scrapes the user and updates the persona and topics.
+    When several users are due, the most requested one goes first, and
+    refreshes are at least `spacing` seconds apart.
+    """
+
+    def __init__(self, usernames, spacing=None, retry_delay=None):
+        super().__init__(daemon=True, name="cache-warmer")
+        self.usernames = list(usernames)
+        self.spacing = WARM_SPACING if spacing is None else spacing
+        self.retry_delay = WARM_RETRY_DELAY if retry_delay is None else retry_delay
+        self.refreshed = 0
+        self._retry_at = {}
+        self._failures = {}
+        self._stop_event = threading.Event()
+
+    def next_user(self, now=None):
+        """Returns (username, due_at) of the user to refresh next."""
+        now = now or time.time()
+        counts = get_request_counts()
+        due = {name: max(refresh_due_at(name), self._retry_at.get(name, 0)) for name in self.usernames}
+        ready = [name for name in self.usernames if due[name] <= now]
+        if ready:
+            # Most requested first; among equals, the one closest to expiry
+            name = min(ready, key=lambda name: (-counts.get(name.lower(), 0), due[name]))
+        else:
+            name = min(self.usernames, key=lambda name: due[name])
+        return name, due[name]
+
+    def refresh(self, username):
+        start = time.time()
+        try:
+            result = get_or_run_pipeline(username, force=True)
+        except Exception as e:
+            result = None
+            print(f"Error refreshing u/{username}: {e}")
+        if result is not None and result["user_data"] is not None:
+            self.refreshed += 1
+            print(f"[WARMER] Refreshed u/{username} in {time.time() - start:.1f}s: status={result['status']}")
+        if result is None or result["user_data"] is None or not is_complete(result):
+            # Incomplete results expire quickly; back off instead of re-running the whole pipeline each time
+            failures = self._failures.get(username, 0) + 1
+            self._failures[username] = failures
+            delay = min(self.retry_delay * 2 ** (failures - 1), WARM_MAX_RETRY_DELAY)
+            self._retry_at[username] = time.time() + delay
+            return False
+        self._failures.pop(username, None)
+        self._retry_at.pop(username, None)
+        return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            username, due_at = self.next_user()
+            wait = due_at - time.time()
+            if wait > 0:
+                # Wake up early enough to notice new requests changing the order
+                self._stop_event.wait(min(wait, max(self.spacing, 1)))
+                continue
+            self.refresh(username)
+            self._stop_event.wait(self.spacing)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def start_cache_warmer(usernames=None):
+    """
+    Starts the process-wide cache warmer for the watch-list (see load_watchlist)
+    if it is not running yet. Returns the warmer, or None if the watch-list is empty.
+    """
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            usernames = load_watchlist() if usernames is None else usernames
+            if not usernames:
+                return None
+            _warmer = CacheWarmer(usernames)
+            _warmer.start()
+        return _warmer
@@ -0,0 +1,67 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from api.people_api import create_pdl_params, enhance_persona_with_pdl_data, fetch_pdl_data, has_enough_for_pdl
+from core.persona_store import update_persona
+
+load_dotenv()
+
+ENRICHMENT_TIMEOUT = float(os.getenv("ENRICHMENT_TIMEOUT", "15"))
+# Finished lookups nobody has collected are dropped, oldest first, beyond this many
+ENRICHMENT_MAX_JOBS = int(os.getenv("ENRICHMENT_MAX_JOBS", "256"))
+
+# People Data Labs lookups run here, off the request path
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ENRICHMENT_WORKERS", "4")), thread_name_prefix="enrichment")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _enrich(username, persona, timeout):
+    pdl_data = fetch_pdl_data(persona, timeout, username)
+    if not pdl_data:
+        return None
+    # Merge into whatever is stored now, which may be newer than the persona we looked up
+    return update_persona(username, lambda stored: enhance_persona_with_pdl_data(stored, pdl_data), default=persona)
+
+def start_enrichment(username, persona, timeout=None):
+    """
+    Starts a background People Data Labs enrichment for a persona.
+    Returns "pending" if a lookup was started, or "skipped" if the persona has too little to match on.
+    """
+    if not has_enough_for_pdl(create_pdl_params(persona, username), username):
+        return "skipped"
+    with _jobs_lock:
+        job = _jobs.get(username.lower())
+        if job is None or job.done():
+            _jobs.pop(username.lower(), None)
+            _jobs[username.lower()] = _executor.submit(_enrich, username, persona, timeout or ENRICHMENT_TIMEOUT)
+            finished = [key for key, job in _jobs.items() if job.done()]
+            for key in finished[:max(len(_jobs) - ENRICHMENT_MAX_JOBS, 0)]:
+                del _jobs[key]
+    return "pending"
+
+def _job_status(job):
+    if job is None:
+        return None
+    if not job.done():
+        return "pending"
+    return "done" if job.exception() is None and job.result() else "failed"
+
+def enrichment_status(username):
+    """
+    Returns "pending", "done", "failed", or None if no enrichment was started
+    for the user or its result has already been collected.
+    """
+    return _job_status(_jobs.get(username.lower()))
+
+def collect_enrichment(username):
+    """
+    Returns (status, enriched persona or None) like enrichment_status, and
+    forgets the lookup once it has finished, so each result is collected once.
+    """
+    with _jobs_lock:
+        job = _jobs.get(username.lower())
+        status = _job_status(job)
+        if status in ("done", "failed"):
+            del _jobs[username.lower()]
+    return status, job.result() if status == "done" else None
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import threading
+import google.generativeai as genai
+from dotenv import load_dotenv
+from core.persona_schema import ENTRY_LIST_FIELDS, validate_persona
+
+load_dotenv()
+
+# Model tiers, cheapest first. A request starts at the tier picked by the router
+# and escalates to the next one only when the result fails its quality check.
+PERSONA_TIERS = {
+    "light": {
+        "model": os.getenv("PERSONA_LIGHT_MODEL", "gemini-2.5-flash-lite"),
+        "generation_config": {"max_output_tokens": int(os.getenv("PERSONA_LIGHT_MAX_TOKENS", "4096"))},
+    },
+    "strong": {
+        "model": os.getenv("PERSONA_STRONG_MODEL", "gemini-2.5-flash"),
+        "generation_config": None,
+    },
+}
+TOPIC_NAME_TIERS = {
+    "light": {
+        "model": os.getenv("TOPIC_LIGHT_MODEL", "gemini-2.5-flash-lite"),
+        "generation_config": {"max_output_tokens": 16},
+    },
+    "strong": {
+        "model": os.getenv("TOPIC_STRONG_MODEL", "gemini-2.5-flash"),
+        # gemini-2.5-flash thinks before answering and the thinking counts against this cap;
+        # google.generativeai cannot turn thinking off, so leave room for it plus the label
+        "generation_config": {"max_output_tokens": int(os.getenv("TOPIC_STRONG_MAX_TOKENS", "1024"))},
+    },
+}
+
+# Inputs at or below these sizes start on the light tier
+SMALL_INPUT_ITEMS = int(os.getenv("ROUTER_SMALL_INPUT_ITEMS", "60"))
+SMALL_PROMPT_CHARS = int(os.getenv("ROUTER_SMALL_PROMPT_CHARS", "40000"))
+
+# A persona needs this many entries in each list field to count as complete
+MIN_LIST_ENTRIES = int(os.getenv("ROUTER_MIN_LIST_ENTRIES", "1"))
+# Up to this many invalid fields are fixed with targeted re-prompts instead of escalating
+MAX_FIELD_FIXES = int(os.getenv("ROUTER_MAX_FIELD_FIXES", "3"))
+
+# Optional JSON-lines file that receives every routing decision
+ROUTING_LOG_PATH = os.getenv("ROUTING_LOG_PATH")
+_log_lock = threading.Lock()
+
+def route_persona(item_count, prompt_chars):
+    """Returns the ordered list of persona tier names to try for an input of this size."""
+    if item_count <= SMALL_INPUT_ITEMS and prompt_chars <= SMALL_PROMPT_CHARS:
+        return ["light", "strong"]
+    return ["strong"]
+
+def check_persona(persona):
+    """Quick quality check on a parsed full persona. Returns (ok, reason)."""
+    if not isinstance(persona, dict):
+        return False, "not a JSON object"
+    sparse = [field for field in ENTRY_LIST_FIELDS
+              if isinstance(persona.get(field), list) and len(persona[field]) < MIN_LIST_ENTRIES]
+    if sparse:
+        return False, f"too sparse: {', '.join(sparse)}"
+    problems = validate_persona(persona)
+    if len(problems) > MAX_FIELD_FIXES:
+        return False, f"invalid fields: {', '.join(problems)}"
+    return True, "ok" if not problems else f"accepted with fixable fields: {', '.join(problems)}"
+
+def check_persona_delta(delta):
+    """Quality check on an incremental update delta. Returns (ok, reason)."""
+    if not isinstance(delta, dict) or not ({"set", "append"} & set(delta)):
+        return False, "not a set/append delta"
+    return True, "ok"
+
+def check_topic_name(name):
+    """Quality check on a generated topic label. Returns (ok, reason)."""
+    if not name:
+        return False, "empty"
+    if name.lower().startswith("topic name") or name.lower().startswith("keywords"):
+        return False, "echoed the prompt"
+    return True, "ok"
+
+def log_route(task, tier_name, tier, outcome, reason, latency, **context):
+    """Records one routing decision on the console and, if configured, in ROUTING_LOG_PATH."""
+    entry = {
+        "ts": round(time.time(), 3),
+        "task": task,
+        "tier": tier_name,
+        "model": tier["model"],
+        "outcome": outcome,
+        "reason": reason,
+        "latency_s": round(latency, 3),
+        **context,
+    }
+    print(f"[ROUTER] {json.dumps(entry)}")
+    if ROUTING_LOG_PATH:
+        try:
+            with _log_lock, open(ROUTING_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except Exception as e:
+            print(f"Error writing routing log: {e}")
+
+def run_cascade(task, tiers, tier_names, prompt, parse, check, timeout=None, **context):
+    """
+    Sends prompt to each tier in tier_names in turn until parse(response text)
+    passes check. Returns the accepted result; if every tier fails the check,
+    returns the last result that parsed, or raises the last error.
+    Args:
+        task (str): label for the routing log, e.g. "persona"
+        tiers (dict): tier name -> {"model", "generation_config"}
+        timeout (float): total seconds for all attempts together
+        context: extra fields recorded with each routing decision
+    """
+    deadline = time.time() + timeout if timeout else None
+    last_result, last_error = None, None
+
+    for index, tier_name in enumerate(tier_names):
+        tier = tiers[tier_name]
+        is_last = index == len(tier_names) - 1
+        start = time.time()
+        try:
+            model = genai.GenerativeModel(tier["model"], generation_config=tier["generation_config"])
+            request_options = {"timeout": max(deadline - time.time(), 1)} if deadline else None
+            response = model.generate_content(prompt, request_options=request_options)
+            result = parse(response.text)
+            ok, reason = check(result)
+            last_result = result
+        except Exception as e:
+            ok, reason, last_error = False, f"error: {e}", e
+
+        outcome = "accepted" if ok else ("failed" if is_last else "escalated")
+        log_route(task, tier_name, tier, outcome, reason, time.time() - start, **context)
+        if ok:
+            return result
+        if deadline and time.time() >= deadline:
+            break
+
+    if last_result is not None:
+        return last_result
+    raise last_error or RuntimeError(f"{task}: no model tier produced a result")
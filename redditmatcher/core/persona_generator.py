@@ -1,37 +1,248 @@
 import os
+import time
+import json
 import google.generativeai as genai
 from dotenv import load_dotenv
 from api.people_api import enrich_persona_with_pdl
+from core.activity_features import format_activity_features
+from core.model_router import PERSONA_TIERS, check_persona, check_persona_delta, route_persona, run_cascade
+from core.persona_schema import (
+    PersonaParseError, coerce_persona, load_field_descriptions, parse_json_tolerant,
+    parse_persona, record_parse_outcome, validate_persona,
+)
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
-def generate_persona(user_data):
+# Fraction of new items (relative to the history the persona was last fully
+# built from) past which an incremental update gives way to a full rebuild.
+PERSONA_DRIFT_THRESHOLD = float(os.getenv("PERSONA_DRIFT_THRESHOLD", "0.3"))
+
+# Number of most recent comments/submissions sent verbatim in a full build;
+# the precomputed activity features cover the rest of the history.
+PERSONA_PROMPT_RAW_ITEMS = int(os.getenv("PERSONA_PROMPT_RAW_ITEMS", "40"))
+
+def _load_prompt(filename):
+    """Reads a prompt template from the redditmatcher directory."""
+    script_dir = os.path.dirname(__file__)
+    prompt_file_path = os.path.join(script_dir, "..", filename)
+    with open(prompt_file_path, "r") as f:
+        return f.read()
+
+def _escape_items(items):
+    """Escape backslashes and other special characters in user data."""
+    return [str(item).encode('unicode_escape').decode() for item in items]
+
+def _parse_json_response(text):
+    print(f"Raw Gemini API Response: {text}")
+    return parse_json_tolerant(text)[0]
+
+def _latest_item_utc(user_data):
+    times = [item["created_utc"] for key in ("comments", "submissions") for item in user_data.get(key, [])]
+    return max(times) if times else 0
+
+def _item_count(user_data):
+    return len(user_data.get("comments", [])) + len(user_data.get("submissions", []))
+
+def _new_items(user_data, since_utc):
+    """Returns the comments and submissions created after since_utc."""
+    new_comments = [c for c in user_data.get("comments", []) if c["created_utc"] > since_utc]
+    new_submissions = [s for s in user_data.get("submissions", []) if s["created_utc"] > since_utc]
+    return new_comments, new_submissions
+
+def _needs_full_rebuild(previous_persona, new_item_count):
+    """Decides whether the accumulated drift since the last full build is too large for a delta."""
+    meta = previous_persona.get("_meta") if previous_persona else None
+    if not meta or "error" in previous_persona:
+        return True
+    baseline = max(meta.get("rebuild_item_count", 0), 1)
+    drift = (meta.get("items_since_rebuild", 0) + new_item_count) / baseline
+    return drift > PERSONA_DRIFT_THRESHOLD
+
+def _apply_user_stats(persona, user_data):
+    """Copies the numeric stats that come straight from the scraped data."""
+    persona["comment_karma"] = user_data["comment_karma"]
+    persona["link_karma"] = user_data["link_karma"]
+    persona["posts_per_week_comments"] = user_data.get('posts_per_week', {}).get('comments', 0)
+    persona["posts_per_week_submissions"] = user_data.get('posts_per_week', {}).get('submissions', 0)
+
+def merge_persona_delta(persona, delta):
+    """
+    Merges an update delta of the form {"set": {...}, "append": {...}} into a persona.
+    Returns a new dictionary; the original persona is left untouched.
+    """
+    merged = persona.copy()
+    for field, value in (delta.get("set") or {}).items():
+        merged[field] = value
+    for field, entries in (delta.get("append") or {}).items():
+        if not isinstance(entries, list):
+            continue
+        existing = list(merged.get(field) or [])
+        merged[field] = existing + [entry for entry in entries if entry not in existing]
+    return merged
+
+def _update_persona(user_data, previous_persona, new_comments, new_submissions, timeout=None):
+    """
+    Asks Gemini for a delta covering only the new activity and merges it into the previous persona.
+    The fields the delta sets or appends to are checked against the schema; those
+    that neither local repair nor a field re-prompt can fix make the update fail.
+    Defects the previous persona already had are left alone.
+    """
+    try:
+        prompt_template = _load_prompt("persona_update_prompt.txt")
+    except FileNotFoundError:
+        return {"error": "persona_update_prompt.txt not found."}
+
+    previous = {k: v for k, v in previous_persona.items() if k != "_meta"}
+    prompt = prompt_template.format(
+        previous_persona=json.dumps(previous, ensure_ascii=False),
+        username=user_data['username'],
+        comment_karma=user_data['comment_karma'],
+        link_karma=user_data['link_karma'],
+        posts_per_week_comments=user_data.get('posts_per_week', {}).get('comments', 0),
+        posts_per_week_submissions=user_data.get('posts_per_week', {}).get('submissions', 0),
+        activity_features=format_activity_features(user_data.get('activity_features')),
+        new_comments=_escape_items(new_comments),
+        new_submissions=_escape_items(new_submissions),
+    )
+
+    deadline = time.time() + timeout if timeout else None
+    try:
+        # Deltas are small, so always start on the light tier
+        delta = run_cascade(
+            "persona_update", PERSONA_TIERS, ["light", "strong"], prompt,
+            _parse_json_response, check_persona_delta, timeout,
+            username=user_data['username'], new_items=len(new_comments) + len(new_submissions),
+        )
+        persona, problems, _ = coerce_persona(merge_persona_delta(previous_persona, delta))
+        changed = {*(delta.get("set") or {}), *(delta.get("append") or {})}
+        problems = {field: problem for field, problem in problems.items() if field in changed}
+        if problems:
+            new_items = {**user_data, "comments": new_comments, "submissions": new_submissions}
+            unfixed = _repair_persona(persona, problems, new_items, deadline)
+            if unfixed:
+                return {"error": f"update left invalid fields: {unfixed}"}
+        return persona
+    except Exception as e:
+        return {"error": str(e)}
+
+def _fix_field(persona, field, problem, user_data, timeout=None):
+    """
+    Re-prompts Gemini for a single persona field that local repair could not fix.
+    Returns the corrected value, or None if the model's answer is still invalid.
+    """
+    prompt_template = _load_prompt("persona_fix_prompt.txt")
+    sample_items = [str(item)[:300] for item in (user_data['comments'] + user_data['submissions'])[:8]]
+    prompt = prompt_template.format(
+        username=user_data['username'],
+        field=field,
+        description=load_field_descriptions().get(field, ""),
+        current_value=json.dumps(persona.get(field), ensure_ascii=False) if field in persona else "missing",
+        problem=problem,
+        sample_items="\n".join(f"- {item}" for item in sample_items),
+    )
+
+    def parse(text):
+        data = parse_json_tolerant(text)[0]
+        return coerce_persona({**persona, field: data.get(field)})
+
+    def check(coerced):
+        return (False, coerced[1][field]) if field in coerced[1] else (True, "ok")
+
+    try:
+        coerced = run_cascade("persona_fix", PERSONA_TIERS, ["light", "strong"], prompt, parse, check,
+                              timeout, username=user_data['username'], field=field)
+    except Exception as e:
+        print(f"Error fixing persona field {field}: {e}")
+        return None
+    return coerced[0].get(field) if field not in coerced[1] else None
+
+def _repair_persona(persona, problems, user_data, deadline=None):
+    """Fixes the remaining invalid fields one targeted re-prompt at a time. Returns the unfixed fields."""
+    unfixed = {}
+    for field, problem in problems.items():
+        remaining = deadline - time.time() if deadline else None
+        if remaining is not None and remaining <= 0:
+            unfixed[field] = problem
+            continue
+        value = _fix_field(persona, field, problem, user_data, remaining)
+        if value is None:
+            unfixed[field] = problem
+        else:
+            persona[field] = value
+    return unfixed
+
+def generate_persona(user_data, previous_persona=None, enrich=False, timeout=None):
     """
     Generates a structured user persona using Gemini API based on Reddit data.
     Returns a dictionary with persona fields for UI rendering.
+
+    If previous_persona (as returned by an earlier call) is given, only the items
+    posted since it was built are sent to Gemini and the returned delta is merged
+    into it. A full rebuild happens when there is no usable previous persona or
+    the new activity exceeds PERSONA_DRIFT_THRESHOLD.
+
+    The Gemini model is picked by core.model_router from the input size, escalating
+    to the stronger model when the result fails its quality check. The response is
+    parsed against core.persona_schema; defects are repaired locally where possible
+    and with small per-field re-prompts otherwise.
+
+    enrich=True also runs a blocking People Data Labs lookup; by default that is
+    left to core.enrichment, which runs it in the background. timeout (seconds)
+    is the total for all Gemini calls of this persona, shared by the routing
+    tiers and any field re-prompts.
     """
     if not GEMINI_API_KEY:
         return {"error": "Gemini API key not found."}
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    # One deadline for everything below, including a full rebuild after a failed update
+    deadline = time.time() + timeout if timeout else None
+    latest_utc = _latest_item_utc(user_data)
+
+    if previous_persona and previous_persona.get("_meta"):
+        meta = previous_persona["_meta"]
+        new_comments, new_submissions = _new_items(user_data, meta.get("latest_item_utc", 0))
+        new_item_count = len(new_comments) + len(new_submissions)
+
+        if new_item_count == 0:
+            persona = previous_persona.copy()
+            _apply_user_stats(persona, user_data)
+            persona["_meta"] = {**meta, "mode": "unchanged"}
+            return persona
+
+        if not _needs_full_rebuild(previous_persona, new_item_count):
+            persona = _update_persona(user_data, previous_persona, new_comments, new_submissions, timeout)
+            if "error" not in persona:
+                _apply_user_stats(persona, user_data)
+                persona["_meta"] = {
+                    **meta,
+                    "built_at": time.time(),
+                    "latest_item_utc": latest_utc,
+                    "items_since_rebuild": meta.get("items_since_rebuild", 0) + new_item_count,
+                    "mode": "update",
+                }
+                return persona
+            print(f"Incremental update failed, falling back to full rebuild: {persona['error']}")
 
     # Read prompt from file
     try:
-        script_dir = os.path.dirname(__file__)
-        prompt_file_path = os.path.join(script_dir, "..", "persona_prompt.txt")
-        with open(prompt_file_path, "r") as f:
-            prompt_template = f.read()
+        prompt_template = _load_prompt("persona_prompt.txt")
         print(f"[DEBUG] prompt_template content: {prompt_template[:200]}...") # Print first 200 chars
     except FileNotFoundError:
         return {"error": "persona_prompt.txt not found."}
 
+    item_count = _item_count(user_data)
+    total_comments = len(user_data.get('comments', []))
+    total_submissions = len(user_data.get('submissions', []))
+    user_data['comments'] = user_data.get('comments', [])[:PERSONA_PROMPT_RAW_ITEMS]
+    user_data['submissions'] = user_data.get('submissions', [])[:PERSONA_PROMPT_RAW_ITEMS]
+
     # Escape backslashes and other special characters in user data
     for key in ['comments', 'submissions', 'top_comments', 'top_submissions']:
         if key in user_data and isinstance(user_data[key], list):
-            user_data[key] = [str(item).encode('unicode_escape').decode() for item in user_data[key]]
+            user_data[key] = _escape_items(user_data[key])
 
     prompt = prompt_template.format(
         username=user_data['username'],
@@ -41,21 +252,56 @@ def generate_persona(user_data):
         posts_per_week_submissions=user_data.get('posts_per_week', {}).get('submissions', 0),
         top_comments=user_data.get('top_comments', []),
         top_submissions=user_data.get('top_submissions', []),
+        total_comments=total_comments,
+        total_submissions=total_submissions,
+        activity_features=format_activity_features(user_data.get('activity_features')),
+        comment_count=len(user_data['comments']),
+        submission_count=len(user_data['submissions']),
         comments=user_data['comments'],
         submissions=user_data['submissions']
     )
 
+    timeout = max(deadline - time.time(), 1) if deadline else None
+    reports = []
+
+    def parse(text):
+        print(f"Raw Gemini API Response: {text}")
+        persona, report = parse_persona(text)
+        reports.append(report)
+        return persona
+
     try:
-        response = model.generate_content(prompt)
-        print(f"Raw Gemini API Response: {response.text}") # Add this line for debugging
-        import json
-        json_string = response.text.strip()
-        if json_string.startswith('```json') and json_string.endswith('```'):
-            json_string = json_string[len('```json'):-len('```')].strip()
-        persona = json.loads(json_string)
+        tier_names = route_persona(item_count, len(prompt))
+        persona = run_cascade(
+            "persona", PERSONA_TIERS, tier_names, prompt,
+            parse, check_persona, timeout,
+            username=user_data['username'], input_items=item_count, prompt_chars=len(prompt),
+        )
+        _apply_user_stats(persona, user_data)
+
+        # Fields local repair could not fix get a targeted re-prompt each
+        report = reports[-1]
+        problems = {field: report["problems"].get(field, problem) for field, problem in validate_persona(persona).items()}
+        if problems:
+            unfixed = _repair_persona(persona, problems, user_data, deadline)
+            record_parse_outcome("unrepaired" if unfixed else "reprompted")
+            if unfixed:
+                print(f"Persona fields left unrepaired: {unfixed}")
+        else:
+            record_parse_outcome("repaired_locally" if report["repaired"] else "clean")
 
         # Enrich persona with People Data Labs API
-        enriched_persona = enrich_persona_with_pdl(persona)
+        enriched_persona = enrich_persona_with_pdl(persona, username=user_data['username']) if enrich else persona
+        enriched_persona["_meta"] = {
+            "built_at": time.time(),
+            "latest_item_utc": latest_utc,
+            "rebuild_item_count": item_count,
+            "items_since_rebuild": 0,
+            "mode": "full",
+        }
         return enriched_persona
+    except PersonaParseError as e:
+        record_parse_outcome("unparseable")
+        return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import threading
+
+# Persona fields, matching persona_prompt.txt
+STRING_FIELDS = ["name", "age", "occupation", "status", "location", "summary_quote", "sentiment_tone"]
+NUMBER_FIELDS = {"comment_karma": int, "link_karma": int, "posts_per_week_comments": float, "posts_per_week_submissions": float}
+STRING_LIST_FIELDS = ["subreddits_active", "top_comments", "top_submissions"]
+# List field -> (label key of each entry, whether entries carry a 1-10 "degree")
+ENTRY_LIST_FIELDS = {
+    "personality_traits": ("trait", True),
+    "motivations": ("motivation", True),
+    "behaviour_habits": ("habit", False),
+    "frustrations": ("frustration", False),
+    "goals_needs": ("goal_need", False),
+}
+REQUIRED_FIELDS = ["name", "age", "occupation", "summary_quote", "subreddits_active", "sentiment_tone", *ENTRY_LIST_FIELDS]
+
+DEGREE_WORDS = {"very low": 2, "low": 3, "moderate": 5, "medium": 5, "high": 8, "very high": 9}
+
+class PersonaParseError(ValueError):
+    """Raised when no JSON object can be recovered from a model response."""
+
+def load_field_descriptions():
+    """Reads the field descriptions ("- field: (description)") from persona_prompt.txt."""
+    script_dir = os.path.dirname(__file__)
+    with open(os.path.join(script_dir, "..", "persona_prompt.txt"), "r") as f:
+        return dict(re.findall(r"^- (\w+): \((.*)\)$", f.read(), flags=re.MULTILINE))
+
+# --- Tolerant JSON parsing ---
+
+def _strip_trailing_commas(text):
+    return re.sub(r",(\s*[}\]])", r"\1", text)
+
+def _close_truncated(text):
+    """
+    Closes the open arrays/objects at the end of truncated JSON. An unterminated
+    string is dropped rather than closed, so a cut-off value shows up as missing
+    instead of passing as complete.
+    """
+    stack, in_string, escaped, string_start = [], False, False, 0
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string, string_start = True, index
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if not stack and not in_string:
+        return text
+
+    if in_string:
+        text = text[:string_start]
+    text = text.rstrip()
+    # Drop a dangling key ("key": or "key") or a trailing comma
+    if stack and stack[-1] == "}":
+        text = re.sub(r'([{,])\s*"[^"]*"\s*:?\s*$', r"\1", text)
+    text = re.sub(r"[,:]\s*$", "", text)
+    return _strip_trailing_commas(text + "".join(reversed(stack)))
+
+def parse_json_tolerant(text):
+    """
+    Parses the first JSON object in a model response, fixing common defects:
+    code fences, prose around the object, trailing commas and truncation.
+    Returns:
+        (data, repaired): the parsed object and whether the text needed fixing
+    """
+    text = text.strip()
+    start = text.find("{")
+    if start == -1:
+        raise PersonaParseError("no JSON object in response")
+    candidate = text[start:]
+    decoder = json.JSONDecoder(strict=False)
+
+    attempts = [
+        candidate,
+        _strip_trailing_commas(candidate),
+        _close_truncated(_strip_trailing_commas(re.sub(r"\s*```\s*$", "", candidate))),
+    ]
+    for index, attempt in enumerate(attempts):
+        try:
+            data, end = decoder.raw_decode(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            # Prose before the object or after it is harmless; only count real JSON fixes
+            return data, index > 0
+    raise PersonaParseError("could not repair JSON in response")
+
+# --- Schema coercion ---
+
+def coerce_degree(value):
+    """Coerces a degree such as 7, 7.4, "7/10" or "high" to an integer 1-10, or None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = value
+    elif isinstance(value, str):
+        match = re.search(r"\d+(?:\.\d+)?", value)
+        if match:
+            number = float(match.group())
+        else:
+            number = DEGREE_WORDS.get(value.strip().lower())
+            if number is None:
+                return None
+    else:
+        return None
+    return int(min(max(round(number), 1), 10))
+
+def _coerce_string(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+        return ", ".join(str(v) for v in value)
+    return None
+
+def _coerce_citations(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, list):
+        return [str(v) for v in value if v not in (None, "")]
+    return []
+
+def _coerce_entries(field, value):
+    """Coerces a list-of-entries field. Returns (entries, problem or None)."""
+    label_key, has_degree = ENTRY_LIST_FIELDS[field]
+    if isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        return None, "expected an array of objects"
+
+    entries = []
+    for item in value:
+        if isinstance(item, str):
+            item = {label_key: item}
+        if not isinstance(item, dict) or not _coerce_string(item.get(label_key)):
+            return None, f"each entry needs a \"{label_key}\""
+        entry = {**item, label_key: _coerce_string(item[label_key]), "citations": _coerce_citations(item.get("citations"))}
+        if has_degree:
+            degree = coerce_degree(item.get("degree"))
+            if degree is None:
+                return None, f"\"degree\" of \"{entry[label_key]}\" is not an integer 1-10"
+            entry["degree"] = degree
+        entries.append(entry)
+    return entries, None
+
+def coerce_persona(data):
+    """
+    Coerces a parsed persona to the schema, fixing wrong types locally.
+    Fields that cannot be fixed are left out.
+    Returns:
+        (persona, problems, fixed): the coerced persona, {field: problem} for
+        missing or unfixable fields, and whether anything had to be changed
+    """
+    persona = {key: value for key, value in data.items() if key not in ENTRY_LIST_FIELDS
+               and key not in STRING_FIELDS and key not in NUMBER_FIELDS and key not in STRING_LIST_FIELDS}
+    problems = {}
+
+    for field in STRING_FIELDS:
+        if data.get(field) in (None, ""):
+            continue
+        value = _coerce_string(data[field])
+        if value is None:
+            problems[field] = "expected a string"
+        else:
+            persona[field] = value
+
+    for field, number_type in NUMBER_FIELDS.items():
+        if field not in data:
+            continue
+        try:
+            persona[field] = number_type(float(str(data[field]).replace(",", "")))
+        except (TypeError, ValueError):
+            problems[field] = "expected a number"
+
+    for field in STRING_LIST_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(",") if v.strip()]
+        if isinstance(value, list):
+            persona[field] = [v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in value]
+        else:
+            problems[field] = "expected an array of strings"
+
+    for field in ENTRY_LIST_FIELDS:
+        if data.get(field) is None:
+            continue
+        entries, problem = _coerce_entries(field, data[field])
+        if problem:
+            problems[field] = problem
+        else:
+            persona[field] = entries
+
+    for field in REQUIRED_FIELDS:
+        if field not in persona and field not in problems:
+            problems[field] = "missing"
+        elif field in STRING_LIST_FIELDS and persona.get(field) == []:
+            problems[field] = "empty"
+
+    fixed = any(persona.get(key) != data.get(key) for key in persona)
+    return persona, problems, fixed
+
+def validate_persona(persona):
+    """Returns {field: problem} for a persona; empty if it matches the schema."""
+    return coerce_persona(persona)[1]
+
+def parse_persona(text):
+    """
+    Parses and coerces a full persona from a model response.
+    Returns:
+        (persona, report): report has 'repaired' (bool) and 'problems' ({field: problem})
+    Raises:
+        PersonaParseError if no JSON object can be recovered
+    """
+    data, text_repaired = parse_json_tolerant(text)
+    persona, problems, fixed = coerce_persona(data)
+    return persona, {"repaired": text_repaired or fixed, "problems": problems}
+
+# --- Repair statistics ---
+
+_stats = {"clean": 0, "repaired_locally": 0, "reprompted": 0, "unrepaired": 0, "unparseable": 0}
+_stats_lock = threading.Lock()
+
+def record_parse_outcome(outcome):
+    """Counts one persona parse outcome (a key of get_repair_stats()['counts'])."""
+    with _stats_lock:
+        _stats[outcome] += 1
+
+def get_repair_stats():
+    """Returns parse outcome counts and the share of personas that needed any repair."""
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    needed_repair = total - counts["clean"]
+    return {
+        "counts": counts,
+        "total": total,
+        "repair_rate": round(needed_repair / total, 3) if total else 0,
+        "local_repair_rate": round(counts["repaired_locally"] / total, 3) if total else 0,
+        "reprompt_rate": round(counts["reprompted"] / total, 3) if total else 0,
+    }
@@ -0,0 +1,60 @@
+import os
+import json
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory where generated personas are kept between runs
+PERSONA_STORE_DIR = os.getenv(
+    "PERSONA_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "personas"),
+)
+
+# Serialises writes and read-modify-write updates from background stages
+_update_lock = threading.RLock()
+
+def _persona_path(username):
+    return os.path.join(PERSONA_STORE_DIR, f"{username.lower()}.json")
+
+def load_persona(username):
+    """Returns the previously stored persona for a user, or None if there is none."""
+    try:
+        with open(_persona_path(username), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading stored persona for u/{username}: {e}")
+        return None
+
+def save_persona(username, persona):
+    """Stores a persona so the next generation can update it incrementally."""
+    if not persona or "error" in persona:
+        return
+    try:
+        with _update_lock:
+            _write_persona(username, persona)
+    except Exception as e:
+        print(f"Error saving persona for u/{username}: {e}")
+
+def _write_persona(username, persona):
+    os.makedirs(PERSONA_STORE_DIR, exist_ok=True)
+    path = _persona_path(username)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(persona, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def update_persona(username, update_fn, default=None):
+    """
+    Applies update_fn to the stored persona (or default if none is stored) and saves the result.
+    Returns the updated persona.
+    """
+    with _update_lock:
+        persona = load_persona(username) or default
+        if persona is None:
+            return None
+        updated = update_fn(persona)
+        save_persona(username, updated)
+        return updated
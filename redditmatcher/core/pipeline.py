@@ -0,0 +1,250 @@
+import os
+import time
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+from core.reddit_scraper import get_user_data
+from core.persona_generator import generate_persona
+from core.enrichment import collect_enrichment, start_enrichment
+from core.persona_store import load_persona, save_persona
+from core.result_cache import get_result, put_result, replace_result
+from core.text_store import compact_user_data
+from core.topic_modeling import TOPIC_MODEL_VERSION, get_topic_distribution, summarize_topic_counts
+
+load_dotenv()
+
+# End-to-end latency budget (seconds) and the per-stage shares of it.
+# People Data Labs enrichment runs in the background and is not budgeted here.
+PIPELINE_BUDGET = float(os.getenv("PIPELINE_BUDGET", "60"))
+STAGE_BUDGETS = {
+    "scrape": float(os.getenv("SCRAPE_BUDGET", "15")),
+    "persona": float(os.getenv("PERSONA_BUDGET", "35")),
+    "topics": float(os.getenv("TOPICS_BUDGET", "40")),
+}
+
+# Each stage has its own bounded pool, sized for the expected number of concurrent
+# sessions, so a backlog in one stage cannot starve the others. Running stages
+# cannot be cancelled: an abandoned stage keeps its worker until it finishes.
+PIPELINE_SESSIONS = int(os.getenv("PIPELINE_SESSIONS", "8"))
+_executors = {
+    stage: ThreadPoolExecutor(
+        max_workers=int(os.getenv(f"{stage.upper()}_WORKERS", PIPELINE_SESSIONS)),
+        thread_name_prefix=f"pipeline-{stage}",
+    )
+    for stage in STAGE_BUDGETS
+}
+# Seconds a stage may wait for a free worker before it is reported as "busy".
+# Queue time does not count against the stage's budget.
+STAGE_QUEUE_TIMEOUT = float(os.getenv("STAGE_QUEUE_TIMEOUT", "30"))
+
+# Username -> (lock, number of callers holding or waiting for it), so concurrent
+# sessions asking for the same user share one run. Entries are removed when unused.
+_user_locks = {}
+_user_locks_guard = threading.Lock()
+
+@contextlib.contextmanager
+def _user_lock(username):
+    key = username.lower()
+    with _user_locks_guard:
+        lock, users = _user_locks.get(key, (None, 0))
+        lock = lock or threading.Lock()
+        _user_locks[key] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _user_locks_guard:
+            lock, users = _user_locks[key]
+            if users == 1:
+                del _user_locks[key]
+            else:
+                _user_locks[key] = (lock, users - 1)
+
+def _remaining(deadline):
+    return max(deadline - time.time(), 0)
+
+class _StageFuture:
+    """A queued stage call that records when a worker actually picked it up."""
+
+    def __init__(self, stage, fn, *args):
+        self.started = threading.Event()
+        self.started_at = None
+        self.future = _executors[stage].submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        self.started_at = time.time()
+        self.started.set()
+        return fn(*args)
+
+def _wait(stage_future, timeout):
+    """
+    Waits for a stage; timeout counts from when the stage started running.
+    Returns (status, value or error message), status "busy" if no worker
+    picked the stage up within STAGE_QUEUE_TIMEOUT.
+    """
+    if not stage_future.started.wait(STAGE_QUEUE_TIMEOUT) and stage_future.future.cancel():
+        return "busy", None
+    stage_future.started.wait()
+    try:
+        return "ok", stage_future.future.result(timeout=_remaining(stage_future.started_at + timeout))
+    except FutureTimeoutError:
+        return "timeout", None
+    except Exception as e:
+        return "error", str(e)
+
+def run_pipeline(username, budget=None):
+    """
+    Runs scrape -> persona and topic modeling under a latency budget.
+    Persona generation and topic modeling run concurrently once the scrape is done;
+    a fully rebuilt persona is then handed to background PDL enrichment (see
+    core.enrichment), reported as status "pending".
+    A stage that overruns its budget (or what is left of the overall budget) is
+    abandoned and reported, and whatever finished in time is returned.
+    Returns:
+        dict with 'username', 'user_data', 'persona', 'topic_counts' (see
+        summarize_topic_counts), 'topic_model_version',
+        'status' (stage -> "ok" | "timeout" | "busy" | "error" | "skipped" | "pending"),
+        'errors' (stage -> message) and 'timings' (stage -> seconds of running time)
+    A scrape cut off at its deadline keeps its partial data but reports "timeout".
+    """
+    start = time.time()
+    deadline = start + (budget or PIPELINE_BUDGET)
+    result = {
+        "username": username,
+        "user_data": None,
+        "persona": None,
+        "topic_counts": (),
+        "topic_model_version": TOPIC_MODEL_VERSION,
+        "status": {stage: "skipped" for stage in [*STAGE_BUDGETS, "enrichment"]},
+        "errors": {},
+        "timings": {},
+    }
+
+    def record(stage, status, value, stage_future):
+        result["status"][stage] = status
+        started_at = stage_future.started_at
+        result["timings"][stage] = round(time.time() - started_at, 2) if started_at else 0
+        if status == "error":
+            result["errors"][stage] = value
+        elif status == "timeout":
+            result["errors"][stage] = f"did not finish within {result['timings'][stage]:.0f}s"
+        elif status == "busy":
+            result["errors"][stage] = f"no free worker within {STAGE_QUEUE_TIMEOUT:.0f}s"
+        return value if status == "ok" else None
+
+    # --- Scrape (everything else depends on it) ---
+    scrape_timeout = min(STAGE_BUDGETS["scrape"], _remaining(deadline))
+    # Let the scraper stop paging a little before the stage deadline so it returns partial data
+    submitted_at = time.time()
+    future = _StageFuture("scrape", lambda: get_user_data(username, time.time() + scrape_timeout * 0.8))
+    status, value = _wait(future, scrape_timeout)
+    if status == "ok" and value is None:
+        status, value = "error", "Could not retrieve data for this user."
+    user_data = record("scrape", status, value, future)
+    if user_data is None:
+        result["timings"]["total"] = round(time.time() - start, 2)
+        return result
+    result["user_data"] = user_data
+    if user_data.get("truncated"):
+        result["status"]["scrape"] = "timeout"
+        result["errors"]["scrape"] = (
+            f"stopped at the deadline after {len(user_data['comments'])} comments "
+            f"and {len(user_data['submissions'])} submissions"
+        )
+    # Time spent waiting for a worker does not count against the overall budget
+    deadline += future.started_at - submitted_at
+
+    # --- Persona and topics run side by side ---
+    persona_timeout = min(STAGE_BUDGETS["persona"], _remaining(deadline))
+    topics_timeout = min(STAGE_BUDGETS["topics"], _remaining(deadline))
+    previous_persona = load_persona(username)
+    persona_future = _StageFuture("persona", generate_persona, user_data.copy(), previous_persona, False, persona_timeout)
+    # Topic naming stops a little before the stage deadline and labels the rest "Topic N"
+    topics_future = _StageFuture(
+        "topics", lambda: get_topic_distribution(user_data["comments"], deadline=time.time() + topics_timeout * 0.8)
+    )
+
+    status, persona = _wait(persona_future, persona_timeout)
+    if status == "ok" and "error" in persona:
+        status, persona = "error", persona["error"]
+    persona = record("persona", status, persona, persona_future)
+
+    if persona is not None:
+        save_persona(username, persona)
+        result["persona"] = persona
+        # --- Enrichment fills gaps in a fresh persona in the background ---
+        if persona.get("_meta", {}).get("mode") == "full":
+            result["status"]["enrichment"] = start_enrichment(username, persona)
+
+    # --- Topics get whatever is left of their own budget ---
+    status, topics = _wait(topics_future, topics_timeout)
+    topics = record("topics", status, topics, topics_future)
+    if topics is not None:
+        result["topic_counts"] = summarize_topic_counts(*topics)
+
+    result["timings"]["total"] = round(time.time() - start, 2)
+    return result
+
+def get_or_run_pipeline(username, budget=None, force=False):
+    """
+    Returns the cached pipeline result for a user, running the pipeline on a miss.
+    Concurrent calls for the same user wait for a single run. force=True ignores the cache.
+    """
+    if not force:
+        cached = get_result(username)
+        if cached is not None:
+            return cached
+
+    with _user_lock(username):
+        if not force:
+            # Another session may have finished the same user while we waited
+            cached = get_result(username, count_request=False)
+            if cached is not None:
+                return cached
+        result = run_pipeline(username, budget)
+        if result["user_data"] is not None:
+            # Cached results keep their texts in the shared, deduplicated text store
+            result["user_data"] = compact_user_data(result["user_data"])
+            put_result(username, result)
+        return result
+
+def apply_finished_enrichment(result):
+    """
+    Merges background PDL enrichment into a pipeline result once it has finished.
+    Returns an updated copy (with the added fields under 'enrichment_added') that
+    also replaces the cached result, or the result itself if nothing changed.
+    Cached results are shared between sessions, so they are never changed in place.
+    """
+    if result["persona"] is None or result["status"]["enrichment"] != "pending":
+        return result
+    username = result["username"]
+    status, enriched = collect_enrichment(username)
+    if status is None:
+        # Another session already collected the lookup and updated the cache
+        cached = get_result(username, count_request=False)
+        if cached is not None and cached["status"]["enrichment"] != "pending":
+            return cached
+        updated = {
+            **result,
+            "status": {**result["status"], "enrichment": "error"},
+            "errors": {**result["errors"], "enrichment": "lookup result is no longer available"},
+        }
+    elif status == "done":
+        persona = result["persona"]
+        updated = {
+            **result,
+            "persona": enriched,
+            "enrichment_added": {k: v for k, v in enriched.items() if k != "_meta" and persona.get(k) != v},
+            "status": {**result["status"], "enrichment": "ok"},
+        }
+    elif status == "failed":
+        updated = {
+            **result,
+            "status": {**result["status"], "enrichment": "error"},
+            "errors": {**result["errors"], "enrichment": "no People Data Labs match"},
+        }
+    else:
+        return result
+    replace_result(username, result, updated)
+    return updated
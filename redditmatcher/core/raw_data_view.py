@@ -0,0 +1,84 @@
+import os
+import math
+from datetime import datetime, time as dt_time, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Items per page in the raw data viewer
+RAW_PAGE_SIZE = int(os.getenv("RAW_PAGE_SIZE", "25"))
+# Longest body/selftext sent to the browser in the raw data viewer and in the main view
+RAW_BODY_CHARS = int(os.getenv("RAW_BODY_CHARS", "2000"))
+MAIN_VIEW_BODY_CHARS = int(os.getenv("MAIN_VIEW_BODY_CHARS", "1000"))
+
+# Keys of user_data holding item lists; everything else is profile metadata
+ITEM_KEYS = ("comments", "submissions", "top_comments", "top_submissions")
+
+def truncate_text(text, limit):
+    """Cuts text to at most limit characters, marking the cut with an ellipsis."""
+    if not text or len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+def profile_summary(user_data):
+    """User data without the item lists, plus how many items each list holds."""
+    summary = {key: value for key, value in user_data.items() if key not in ITEM_KEYS}
+    summary["item_counts"] = {key: len(user_data.get(key) or []) for key in ITEM_KEYS}
+    return summary
+
+def date_range(items):
+    """Returns the (first, last) UTC posting dates of items, or None if there are none."""
+    if not items:
+        return None
+    timestamps = [item["created_utc"] for item in items]
+    return (
+        datetime.fromtimestamp(min(timestamps), tz=timezone.utc).date(),
+        datetime.fromtimestamp(max(timestamps), tz=timezone.utc).date(),
+    )
+
+def filter_items(items, subreddit=None, min_score=None, start_date=None, end_date=None):
+    """
+    Filters scraped comments or submissions.
+    Args:
+        subreddit (str): keep only items from this subreddit (case-insensitive)
+        min_score (int): keep only items scoring at least this much
+        start_date, end_date (datetime.date): inclusive UTC posting date range
+    """
+    start = datetime.combine(start_date, dt_time.min, timezone.utc).timestamp() if start_date else None
+    end = datetime.combine(end_date, dt_time.max, timezone.utc).timestamp() if end_date else None
+    subreddit = subreddit.lower() if subreddit else None
+    return [
+        item for item in items
+        if (subreddit is None or item["subreddit"].lower() == subreddit)
+        and (min_score is None or item["score"] >= min_score)
+        and (start is None or item["created_utc"] >= start)
+        and (end is None or item["created_utc"] <= end)
+    ]
+
+def page_count(total, page_size=None):
+    return max(math.ceil(total / (page_size or RAW_PAGE_SIZE)), 1)
+
+def page_rows(items, page, page_size=None, body_chars=None):
+    """
+    Returns table rows for one 1-based page of items, newest first, with
+    bodies and selftext truncated to body_chars (default RAW_BODY_CHARS).
+    """
+    page_size = page_size or RAW_PAGE_SIZE
+    body_chars = body_chars or RAW_BODY_CHARS
+    ordered = sorted(items, key=lambda item: item["created_utc"], reverse=True)
+    rows = []
+    for item in ordered[(page - 1) * page_size:page * page_size]:
+        row = {
+            "posted": datetime.fromtimestamp(item["created_utc"], tz=timezone.utc).strftime("%Y-%m-%d %H:%M"),
+            "subreddit": item["subreddit"],
+            "score": item["score"],
+        }
+        if "title" in item:
+            row["title"] = item["title"]
+            row["selftext"] = truncate_text(item.get("selftext", ""), body_chars)
+            row["url"] = item.get("url")
+        else:
+            row["body"] = truncate_text(item["body"], body_chars)
+            row["is_reply"] = item.get("is_reply")
+        rows.append(row)
+    return rows
@@ -1,86 +1,101 @@
+import time
 from api.reddit_api import get_reddit_instance
+from core.activity_features import compute_activity_features, top_indices
 
-def get_user_data(username):
-    """Scrapes a Reddit user's profile for their comments and submissions."""
-    reddit = get_reddit_instance()
-    try:
-        redditor = reddit.redditor(username)
+# Number of most recent comments and submissions fetched per user
+FETCH_LIMIT = 100
+
+def new_user_data(redditor):
+    """Returns the user data dict for a fetched redditor, with no comments or submissions yet."""
+    return {
+        "username": redditor.name,
+        "id": redditor.id,
+        "comment_karma": redditor.comment_karma,
+        "link_karma": redditor.link_karma,
+        "created_utc": redditor.created_utc,
+        "profile_img": redditor.icon_img if hasattr(redditor, 'icon_img') else None,
+        "comments": [],
+        "submissions": [],
+        "posts_per_week": {"comments": 0, "submissions": 0},
+        "top_comments": [],
+        "top_submissions": [],
+        "activity_features": {},
+        # Set when paging stopped at the deadline before all items were fetched
+        "truncated": False,
+    }
+
+def comment_to_dict(comment):
+    return {
+        "body": comment.body,
+        "score": comment.score,
+        "subreddit": comment.subreddit.display_name,
+        "created_utc": comment.created_utc,
+        "is_reply": comment.parent_id.startswith("t1_"),
+    }
+
+def submission_to_dict(submission):
+    return {
+        "title": submission.title,
+        "score": submission.score,
+        "subreddit": submission.subreddit.display_name,
+        "created_utc": submission.created_utc,
+        "selftext": submission.selftext,
+        "url": submission.url,
+    }
+
+def finalize_user_data(data, all_comments, all_submissions):
+    """Attaches the scraped items to the user data and computes the derived fields."""
+    data["comments"] = all_comments
+    data["submissions"] = all_submissions
+
+    # Activity features, posting rate and top items in one vectorized pass
+    features = compute_activity_features(all_comments, all_submissions)
+    data["activity_features"] = features
+    data["posts_per_week"] = features["posts_per_week"]
 
-        
+    # Get top comments and submissions
+    data["top_comments"] = [all_comments[i] for i in top_indices([c["score"] for c in all_comments])]
+    data["top_submissions"] = [all_submissions[i] for i in top_indices([s["score"] for s in all_submissions])]
+    return data
 
-        data = {
-            "username": redditor.name,
-            "id": redditor.id,
-            "comment_karma": redditor.comment_karma,
-            "link_karma": redditor.link_karma,
-            "created_utc": redditor.created_utc,
-            "profile_img": redditor.icon_img if hasattr(redditor, 'icon_img') else None,
-            "comments": [],
-            "submissions": [],
-            "posts_per_week": {"comments": 0, "submissions": 0},
-            "top_comments": [],
-            "top_submissions": [],
-        }
+def get_user_data(username, deadline=None):
+    """
+    Scrapes a Reddit user's profile for their comments and submissions.
+    If deadline (a time.time() timestamp) is given, fetching stops once it passes
+    and the items gathered so far are returned.
+    """
+    timeout = max(deadline - time.time(), 1) if deadline else None
+    reddit = get_reddit_instance(timeout=timeout)
+    try:
+        redditor = reddit.redditor(username)
+        data = new_user_data(redditor)
 
         all_comments = []
         all_submissions = []
 
         # Fetch comments
         try:
-            for comment in redditor.comments.new(limit=100):
-                all_comments.append(
-                    {
-                        "body": comment.body,
-                        "score": comment.score,
-                        "subreddit": comment.subreddit.display_name,
-                        "created_utc": comment.created_utc,
-                    }
-                )
+            for comment in redditor.comments.new(limit=FETCH_LIMIT):
+                if deadline and time.time() > deadline:
+                    print(f"Scrape deadline reached for u/{username} after {len(all_comments)} comments")
+                    data["truncated"] = True
+                    break
+                all_comments.append(comment_to_dict(comment))
         except Exception as e:
             print(f"Error fetching comments for u/{username}: {e}")
 
         # Fetch submissions
         try:
-            for submission in redditor.submissions.new(limit=100):
-                all_submissions.append(
-                    {
-                        "title": submission.title,
-                        "score": submission.score,
-                        "subreddit": submission.subreddit.display_name,
-                        "created_utc": submission.created_utc,
-                        "selftext": submission.selftext,
-                        "url": submission.url,
-                    }
-                )
+            for submission in redditor.submissions.new(limit=FETCH_LIMIT):
+                if deadline and time.time() > deadline:
+                    print(f"Scrape deadline reached for u/{username} after {len(all_submissions)} submissions")
+                    data["truncated"] = True
+                    break
+                all_submissions.append(submission_to_dict(submission))
         except Exception as e:
             print(f"Error fetching submissions for u/{username}: {e}")
 
-        data["comments"] = all_comments
-        data["submissions"] = all_submissions
-
-        # Calculate posts per week
-        import time
-        current_time = time.time()
-
-        if all_comments:
-            oldest_comment_time = min([c["created_utc"] for c in all_comments])
-            time_span_seconds = current_time - oldest_comment_time
-            time_span_weeks = time_span_seconds / (7 * 24 * 3600)
-            if time_span_weeks > 0:
-                data["posts_per_week"]["comments"] = len(all_comments) / time_span_weeks
-
-        if all_submissions:
-            oldest_submission_time = min([s["created_utc"] for s in all_submissions])
-            time_span_seconds = current_time - oldest_submission_time
-            time_span_weeks = time_span_seconds / (7 * 24 * 3600)
-            if time_span_weeks > 0:
-                data["posts_per_week"]["submissions"] = len(all_submissions) / time_span_weeks
-
-        # Get top comments and submissions
-        data["top_comments"] = sorted(all_comments, key=lambda x: x["score"], reverse=True)[:3]
-        data["top_submissions"] = sorted(all_submissions, key=lambda x: x["score"], reverse=True)[:3]
-
-        return data
+        return finalize_user_data(data, all_comments, all_submissions)
 
     except Exception as e:
         print(f"An error occurred while scraping data for u/{username}: {e}")
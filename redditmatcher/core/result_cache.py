@@ -0,0 +1,71 @@
+import os
+import time
+import threading
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long a pipeline result is served from memory before it is recomputed.
+# Partial results (a stage timed out or failed) expire sooner so they get retried.
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+PARTIAL_RESULT_TTL = float(os.getenv("PARTIAL_RESULT_TTL", "120"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+_entries = OrderedDict()
+_request_counts = Counter()
+_lock = threading.Lock()
+
+def _key(username):
+    return username.lower()
+
+def is_complete(result):
+    """True if every budgeted pipeline stage finished successfully."""
+    return all(result["status"].get(stage) == "ok" for stage in ("scrape", "persona", "topics"))
+
+def get_result(username, count_request=True):
+    """Returns the cached pipeline result for a user, or None if there is none or it expired."""
+    key = _key(username)
+    with _lock:
+        if count_request:
+            _request_counts[key] += 1
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.time():
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return entry["result"]
+
+def put_result(username, result):
+    """Caches a pipeline result, evicting the least recently used entries past RESULT_CACHE_MAX_ENTRIES."""
+    key = _key(username)
+    ttl = RESULT_CACHE_TTL if is_complete(result) else PARTIAL_RESULT_TTL
+    now = time.time()
+    with _lock:
+        _entries[key] = {"result": result, "stored_at": now, "expires_at": now + ttl}
+        _entries.move_to_end(key)
+        while len(_entries) > RESULT_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+def replace_result(username, old_result, new_result):
+    """
+    Swaps a cached result for an updated copy, keeping its expiry time.
+    Does nothing if the cache no longer holds old_result (it expired or was refreshed).
+    """
+    with _lock:
+        entry = _entries.get(_key(username))
+        if entry is not None and entry["result"] is old_result:
+            entry["result"] = new_result
+
+def cache_times(username):
+    """Returns (stored_at, expires_at) timestamps of the cached result for a user, or None."""
+    with _lock:
+        entry = _entries.get(_key(username))
+        return (entry["stored_at"], entry["expires_at"]) if entry else None
+
+def get_request_counts():
+    """Returns how often each username has been requested since startup."""
+    with _lock:
+        return dict(_request_counts)
@@ -0,0 +1,208 @@
+import os
+import sys
+import gzip
+import json
+import zlib
+import hashlib
+import threading
+import weakref
+from collections.abc import Mapping
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Texts at least this many UTF-8 bytes long are kept zlib-compressed
+TEXT_COMPRESS_MIN = int(os.getenv("TEXT_COMPRESS_MIN", "200"))
+
+def text_id(text):
+    """Content hash used as the id of a stored text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+class StoredText:
+    """One deduplicated text, compressed when it is long enough to pay off."""
+
+    __slots__ = ("id", "_data", "__weakref__")
+
+    def __init__(self, id, text):
+        self.id = id
+        raw = text.encode("utf-8")
+        compressed = zlib.compress(raw) if len(raw) >= TEXT_COMPRESS_MIN else None
+        self._data = compressed if compressed is not None and len(compressed) < len(raw) else text
+
+    @property
+    def text(self):
+        data = self._data
+        return data if isinstance(data, str) else zlib.decompress(data).decode("utf-8")
+
+    @property
+    def stored_bytes(self):
+        data = self._data
+        return len(data) if isinstance(data, bytes) else len(data.encode("utf-8"))
+
+class TextStore:
+    """
+    Content-addressed text store shared by every user in a process.
+    Identical texts (the same comment in a user's history and top list, or
+    text quoted or cross-posted by several users) are kept once. A text is
+    freed when no record references it any more.
+    """
+
+    def __init__(self):
+        self._texts = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.hits = 0
+
+    def put(self, text):
+        """Returns the StoredText for text, adding it if it is new."""
+        key = text_id(text)
+        with self._lock:
+            self.puts += 1
+            stored = self._texts.get(key)
+            if stored is None:
+                stored = StoredText(key, text)
+                self._texts[key] = stored
+            else:
+                self.hits += 1
+            return stored
+
+    def get(self, text_id):
+        """Returns the text with this id; raises KeyError if it is not stored."""
+        with self._lock:
+            return self._texts[text_id].text
+
+    def stats(self):
+        """Number of distinct texts, their stored size and how many puts were deduplicated."""
+        with self._lock:
+            texts = list(self._texts.values())
+            return {
+                "texts": len(texts),
+                "stored_bytes": sum(stored.stored_bytes for stored in texts),
+                "puts": self.puts,
+                "dedup_hits": self.hits,
+            }
+
+TEXT_STORE = TextStore()
+
+class _Record(Mapping):
+    """
+    Read-only, dict-like scraped item with its texts kept in a TextStore.
+    Supports item["body"], item.get(...), "title" in item and dict(item),
+    and its repr matches the dict it replaces.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _text_fields = ()
+
+    def __init__(self, item, store):
+        for field in self._fields:
+            value = item.get(field)
+            if field in self._text_fields:
+                value = store.put(value or "")
+            elif isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, field, value)
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return value.text if key in self._text_fields else value
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def to_row(self):
+        """Flat list for serialization, with texts replaced by their ids."""
+        return [getattr(self, field).id if field in self._text_fields else getattr(self, field)
+                for field in self._fields]
+
+    @classmethod
+    def from_row(cls, row, texts, store):
+        """Rebuilds a record from to_row() output and an id -> text mapping."""
+        item = {field: texts[value] if field in cls._text_fields else value
+                for field, value in zip(cls._fields, row)}
+        return cls(item, store)
+
+class CommentRecord(_Record):
+    __slots__ = ("body", "score", "subreddit", "created_utc", "is_reply")
+    _fields = __slots__
+    _text_fields = ("body",)
+
+class SubmissionRecord(_Record):
+    __slots__ = ("title", "score", "subreddit", "created_utc", "selftext", "url")
+    _fields = __slots__
+    _text_fields = ("title", "selftext")
+
+def compact_user_data(user_data, store=None):
+    """
+    Returns a copy of a user data dict (see core.reddit_scraper) whose comments
+    and submissions are compact records backed by store (default TEXT_STORE).
+    The top_comments/top_submissions entries share the records of the full lists.
+    """
+    store = store or TEXT_STORE
+    compact = dict(user_data)
+    for items_key, top_key, record_type in (("comments", "top_comments", CommentRecord),
+                                            ("submissions", "top_submissions", SubmissionRecord)):
+        items = user_data.get(items_key) or []
+        records = [item if isinstance(item, record_type) else record_type(item, store) for item in items]
+        by_identity = {id(item): record for item, record in zip(items, records)}
+        compact[items_key] = records
+        compact[top_key] = [by_identity.get(id(item)) or record_type(item, store)
+                            for item in user_data.get(top_key) or []]
+    return compact
+
+def dump_users(path, users):
+    """
+    Writes {username: user_data or None} to a gzipped JSON file in which every
+    distinct text appears once and items reference texts by id.
+    """
+    texts = {}
+    out = {}
+    for username, user_data in users.items():
+        if user_data is None:
+            out[username] = None
+            continue
+        user_data = compact_user_data(user_data)
+        entry = {key: value for key, value in user_data.items()
+                 if key not in ("comments", "submissions", "top_comments", "top_submissions")}
+        for key in ("comments", "submissions"):
+            entry[key] = [record.to_row() for record in user_data[key]]
+            for record in user_data[key]:
+                for field in record._text_fields:
+                    stored = getattr(record, field)
+                    texts.setdefault(stored.id, stored.text)
+        # Top items are stored as indices into the full lists
+        for key, top_key in (("comments", "top_comments"), ("submissions", "top_submissions")):
+            positions = {id(record): index for index, record in enumerate(user_data[key])}
+            entry[top_key] = [positions[id(record)] for record in user_data[top_key] if id(record) in positions]
+        out[username] = entry
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"texts": texts, "users": out}, f, ensure_ascii=False)
+
+def load_users(path, store=None):
+    """Reads a file written by dump_users; items come back as compact records."""
+    store = store or TEXT_STORE
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    texts = data["texts"]
+    users = {}
+    for username, entry in data["users"].items():
+        if entry is None:
+            users[username] = None
+            continue
+        user_data = dict(entry)
+        for key, top_key, record_type in (("comments", "top_comments", CommentRecord),
+                                          ("submissions", "top_submissions", SubmissionRecord)):
+            records = [record_type.from_row(row, texts, store) for row in entry[key]]
+            user_data[key] = records
+            user_data[top_key] = [records[index] for index in entry[top_key]]
+        users[username] = user_data
+    return users
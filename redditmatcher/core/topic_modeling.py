@@ -2,11 +2,13 @@ import os
 import ssl
 import nltk
 import re
+import time
 from bertopic import BERTopic
 
 import os
 from nltk.corpus import stopwords
 from sklearn.feature_extraction.text import CountVectorizer
+from core.model_router import TOPIC_NAME_TIERS, check_topic_name, run_cascade
 
 # SSL fix for some environments
 try:
@@ -16,6 +18,9 @@ except AttributeError:
 else:
     ssl._create_default_https_context = _create_unverified_https_context
 
+# Bump whenever the topic model or labelling changes, so cached topic charts are rebuilt
+TOPIC_MODEL_VERSION = "bertopic-gemini-1"
+
 # Download stopwords if not already downloaded
 nltk.download('stopwords')
 STOP_WORDS = set(stopwords.words('english'))
@@ -34,12 +39,14 @@ def trim_topic_label(label, max_words=3):
     words = label.strip().split()
     return " ".join(words[:max_words])
 
-def get_topic_distribution(texts, use_keybert=False):
+def get_topic_distribution(texts, use_keybert=False, deadline=None):
     """
     Fit BERTopic on the given texts for concise topic labels.
     Args:
         texts (list of dict): each dict with 'body' (string)
         use_keybert (bool): if True, use KeyBERTInspired for topic names; else use LLM
+        deadline (float): epoch time by which naming must finish; topics still
+            unnamed at the deadline are labelled "Topic N"
     Returns:
         topic_info (DataFrame): Info about topics (labels, document counts, etc.)
         topic_distr (DataFrame): Mapping of docs to topics
@@ -60,16 +67,14 @@ def get_topic_distribution(texts, use_keybert=False):
     # Choose representation model
     representation_model = None # Will be set later if needed
 
-    # Initialize Gemini model for topic naming
+    # Configure Gemini for topic naming
     import google.generativeai as genai
-    import json
     from dotenv import load_dotenv
 
     load_dotenv()
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     if GEMINI_API_KEY:
         genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel("gemini-1.5-flash")
 
     vectorizer_model = CountVectorizer(
         max_features=3000,
@@ -94,6 +99,11 @@ def get_topic_distribution(texts, use_keybert=False):
             new_topic_names[topic_id] = "Outlier Topic"
             continue
 
+        remaining = deadline - time.time() if deadline else None
+        if remaining is not None and remaining <= 0:
+            new_topic_names[topic_id] = f"Topic {topic_id}"
+            continue
+
         keywords = ", ".join([word[0] for word in topic_model.get_topic(topic_id)])
         prompt = f"""Analyze the following keywords and generate a concise, descriptive topic name of 2-3 words. 
         Example: 
@@ -104,9 +114,14 @@ def get_topic_distribution(texts, use_keybert=False):
         Topic Name:"""
         
         try:
-            response = gemini_model.generate_content(prompt)
-            generated_name = response.text.strip()
-            new_topic_names[topic_id] = trim_topic_label(generated_name, max_words=3)
+            # Topic naming is a tiny task: start on the light model, escalate on a bad label
+            name = run_cascade(
+                "topic_name", TOPIC_NAME_TIERS, ["light", "strong"], prompt,
+                lambda text: trim_topic_label(text.strip(), max_words=3), check_topic_name,
+                timeout=remaining, topic_id=int(topic_id),
+            )
+            # run_cascade hands back the last label even when no tier passed the check
+            new_topic_names[topic_id] = name if check_topic_name(name)[0] else f"Topic {topic_id}"
         except Exception as e:
             print(f"Error generating name for topic {topic_id}: {e}")
             new_topic_names[topic_id] = f"Topic {topic_id}"
@@ -116,4 +131,18 @@ def get_topic_distribution(texts, use_keybert=False):
 
     topic_distr = topic_model.get_document_info(preprocessed_docs)
     return topic_info, topic_distr
-        
\ No newline at end of file
+
+def summarize_topic_counts(topic_info, topic_distr):
+    """
+    Reduces topic modeling output to a compact, hashable structure for charts and caches.
+    Returns:
+        tuple of (topic_id, name, document_count) sorted by topic id, or () if there are no topics
+    """
+    if topic_info is None or topic_distr is None:
+        return ()
+    topic_names = dict(zip(topic_info['Topic'], topic_info['Name']))
+    counts = topic_distr['Topic'].value_counts().sort_index()
+    return tuple(
+        (int(topic_id), topic_names.get(topic_id, f"Topic {topic_id}"), int(count))
+        for topic_id, count in zip(counts.index, counts.values)
+    )
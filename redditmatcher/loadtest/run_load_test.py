@@ -0,0 +1,343 @@
+"""
+Load test for app.py.
+
+Starts one real Streamlit server (`streamlit run loadtest/stub_app.py`, which
+runs app.py against the local stand-ins in loadtest/stubs.py) and drives it with
+concurrent headless clients. Each client speaks Streamlit's websocket protocol
+like a browser tab: it loads the page, enters a profile URL and clicks Generate
+Persona. The harness ramps the number of concurrent clients and reports
+throughput, latency percentiles, the server's peak RSS and the point where
+throughput stops scaling.
+
+All sessions share the server's worker pools, result cache, per-user locks and
+text store, as they do in production. Fragment auto-reruns (the enrichment
+poll) are not simulated.
+
+Run from the redditmatcher directory:
+    python -m loadtest.run_load_test --levels 1,2,4,8,16 --duration 30
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import aiohttp
+import numpy as np
+import requests
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ClientState_pb2 import ClientState
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(APP_DIR, "loadtest", "stub_app.py")
+
+URL_LABEL = "Enter a Reddit profile URL:"
+BUTTON_LABEL = "Generate Persona"
+
+def process_rss_mb(pid):
+    """Resident set size of one process, or 0 if it has exited."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        pass
+    # No /proc (macOS): ps reports RSS in KiB
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+        return int(output.strip()) / 2**10
+    except (OSError, ValueError):
+        return 0
+
+class RSSSampler(threading.Thread):
+    """Samples the RSS of the server process in the background and keeps the peak."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_mb = max(self.peak_mb, process_rss_mb(self.pid))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak_mb
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(stub_options, port, verbose=False, startup_timeout=120):
+    """
+    Starts `streamlit run loadtest/stub_app.py` on 127.0.0.1:port and waits until it is healthy.
+    Returns the server process; its output goes to a log file unless verbose is set.
+    """
+    env = {**os.environ, "LOADTEST_STUBS": json.dumps(stub_options)}
+    command = [
+        sys.executable, "-m", "streamlit", "run", SERVER_SCRIPT,
+        "--server.headless", "true",
+        "--server.address", "127.0.0.1",
+        "--server.port", str(port),
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    if verbose:
+        log_path, output = None, None
+    else:
+        output = tempfile.NamedTemporaryFile(prefix="loadtest-server-", suffix=".log", delete=False)
+        log_path = output.name
+    server = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+    health_url = f"http://127.0.0.1:{port}/_stcore/health"
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            if requests.get(health_url, timeout=2).text.strip() == "ok":
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError(f"Streamlit server did not start{f'; see {log_path}' if log_path else ''}")
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+class Page:
+    """What one script run rendered: widget ids by (type, label), alerts and exceptions."""
+
+    def __init__(self):
+        self.widgets = {}
+        self.alerts = []
+        self.exceptions = []
+
+    def add(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        kind = delta.new_element.WhichOneof("type")
+        element = getattr(delta.new_element, kind)
+        if kind == "alert":
+            self.alerts.append((element.format, element.body))
+        elif kind == "exception":
+            self.exceptions.append(element.message)
+        elif "id" in element.DESCRIPTOR.fields_by_name and "label" in element.DESCRIPTOR.fields_by_name:
+            self.widgets[(kind, element.label)] = element.id
+
+    def alert_bodies(self, alert_format):
+        return [body for fmt, body in self.alerts if fmt == alert_format]
+
+async def run_script(ws, widget_states=()):
+    """Asks the server to rerun the page with these widget states and returns what the run rendered."""
+    message = BackMsg(rerun_script=ClientState(widget_states=WidgetStates(widgets=list(widget_states))))
+    await ws.send_bytes(message.SerializeToString())
+    page = Page()
+    while True:
+        received = await ws.receive()
+        if received.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+            raise ConnectionError("server closed the connection")
+        if received.type != aiohttp.WSMsgType.BINARY:
+            continue
+        forward = ForwardMsg()
+        forward.ParseFromString(received.data)
+        kind = forward.WhichOneof("type")
+        if kind == "delta":
+            page.add(forward.delta)
+        elif kind == "script_finished":
+            if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                # A rerun follows and renders the page again from the top
+                page = Page()
+            elif forward.script_finished != ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                return page
+
+async def run_session(http, ws_url, timeout, shared_user=None):
+    """
+    Simulates one visitor: loads the page, enters a profile URL and clicks Generate Persona.
+    Returns (latency in seconds of the Generate Persona run, success flag, error message).
+    """
+    username = shared_user or f"loadtest_{uuid.uuid4().hex[:10]}"
+    start = time.perf_counter()
+    try:
+        async with http.ws_connect(ws_url, protocols=("streamlit",), max_msg_size=0) as ws:
+            page = await asyncio.wait_for(run_script(ws), timeout)
+            url_id = page.widgets.get(("text_input", URL_LABEL))
+            button_id = page.widgets.get(("button", BUTTON_LABEL))
+            if url_id is None or button_id is None:
+                return 0, False, "page has no profile URL input or Generate Persona button"
+
+            widget_states = [
+                WidgetState(id=url_id, string_value=f"https://www.reddit.com/user/{username}/"),
+                WidgetState(id=button_id, trigger_value=True),
+            ]
+            start = time.perf_counter()
+            page = await asyncio.wait_for(run_script(ws, widget_states), timeout)
+    except asyncio.TimeoutError:
+        return time.perf_counter() - start, False, f"no response within {timeout:.0f}s"
+    except (aiohttp.ClientError, ConnectionError) as e:
+        return time.perf_counter() - start, False, str(e) or type(e).__name__
+    latency = time.perf_counter() - start
+
+    if page.exceptions:
+        return latency, False, page.exceptions[0]
+    errors = page.alert_bodies(Alert.ERROR)
+    if errors:
+        return latency, False, errors[0]
+    if not any("Successfully scraped" in body for body in page.alert_bodies(Alert.SUCCESS)):
+        warnings = page.alert_bodies(Alert.WARNING)
+        return latency, False, f"persona page did not render{f': {warnings[0]}' if warnings else ''}"
+    return latency, True, None
+
+async def run_clients(concurrency, duration, timeout, ws_url, shared_user):
+    """Keeps `concurrency` clients running sessions back to back for `duration` seconds."""
+    results = []
+    stop_at = time.time() + duration
+
+    async def client(http):
+        while time.time() < stop_at:
+            results.append(await run_session(http, ws_url, timeout, shared_user))
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    return results
+
+async def warm_up(ws_url, timeout):
+    """Loads the page once, so the app's first-run imports are not measured."""
+    async with aiohttp.ClientSession() as http:
+        async with http.ws_connect(ws_url, protocols=("streamlit",), max_msg_size=0) as ws:
+            await asyncio.wait_for(run_script(ws), timeout)
+
+def run_level(server, ws_url, concurrency, duration, timeout, shared_user=None):
+    """Runs one concurrency level against the server and summarizes it."""
+    sampler = RSSSampler(server.pid)
+    sampler.start()
+    start = time.time()
+    results = asyncio.run(run_clients(concurrency, duration, timeout, ws_url, shared_user))
+    elapsed = time.time() - start
+    peak_rss = sampler.stop()
+
+    latencies = [latency for latency, ok, _ in results if ok]
+    errors = [error for _, ok, error in results if not ok]
+    lat = np.array(latencies) if latencies else np.array([np.nan])
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "failed": len(errors),
+        "throughput_per_s": round(len(latencies) / elapsed, 3),
+        "p50_s": round(float(p50), 3),
+        "p95_s": round(float(p95), 3),
+        "p99_s": round(float(p99), 3),
+        "max_s": round(float(np.nanmax(lat)), 3),
+        "peak_rss_mb": round(peak_rss, 1),
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+def find_saturation(levels, min_gain, latency_slo):
+    """
+    Returns the first concurrency level past which adding sessions stops paying off:
+    throughput grows by less than min_gain, p95 exceeds latency_slo, or sessions fail.
+    """
+    for previous, level in zip(levels, levels[1:]):
+        if level["failed"] or (latency_slo and level["p95_s"] > latency_slo):
+            return previous["concurrency"]
+        if level["throughput_per_s"] < previous["throughput_per_s"] * (1 + min_gain):
+            return previous["concurrency"]
+    return None
+
+def print_report(levels, saturation, idle_rss):
+    print(f"Server RSS after start-up: {idle_rss:.1f} MB")
+    header = f"{'sessions':>8} {'done':>6} {'fail':>5} {'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for level in levels:
+        print(
+            f"{level['concurrency']:>8} {level['completed']:>6} {level['failed']:>5} "
+            f"{level['throughput_per_s']:>7.2f} {level['p50_s']:>7.2f} {level['p95_s']:>7.2f} "
+            f"{level['p99_s']:>7.2f} {level['max_s']:>7.2f} {level['peak_rss_mb']:>8.1f}"
+        )
+        for error in level["sample_errors"]:
+            print(f"{'':>8} error: {error}")
+    if saturation:
+        print(f"\nSaturation at ~{saturation} concurrent sessions.")
+    else:
+        print("\nNo saturation found in the tested range.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp concurrent Streamlit sessions against app.py with stubbed upstreams.")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to hold each level")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for one page run")
+    parser.add_argument("--port", type=int, default=None, help="port for the Streamlit server (default: a free one)")
+    parser.add_argument("--reddit-latency", type=float, default=0.5, help="seconds per stubbed Reddit request")
+    parser.add_argument("--gemini-latency", type=float, default=3.0, help="seconds per stubbed Gemini call")
+    parser.add_argument("--pdl-latency", type=float, default=2.0, help="seconds per stubbed PDL call")
+    parser.add_argument("--topics-latency", type=float, default=1.0, help="seconds per stubbed topic model run")
+    parser.add_argument("--jitter", type=float, default=0.3, help="relative latency jitter (0.3 = +/-30%%)")
+    parser.add_argument("--items", type=int, default=100, help="comments returned per stubbed user")
+    parser.add_argument("--real-topics", action="store_true", help="run the real BERTopic model instead of a stub")
+    parser.add_argument("--shared-user", help="use one username for every session instead of a fresh one each")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--latency-slo", type=float, default=None, help="p95 seconds above which a level counts as saturated")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the server's console output")
+    args = parser.parse_args(argv)
+
+    stub_options = {
+        "reddit_latency": args.reddit_latency,
+        "gemini_latency": args.gemini_latency,
+        "pdl_latency": args.pdl_latency,
+        "topics_latency": args.topics_latency,
+        "jitter": args.jitter,
+        "items": args.items,
+        "real_topics": args.real_topics,
+    }
+
+    port = args.port or free_port()
+    ws_url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    print(f"Starting the Streamlit server on port {port}...", flush=True)
+    server = start_server(stub_options, port, args.verbose)
+    try:
+        asyncio.run(warm_up(ws_url, args.timeout))
+        idle_rss = process_rss_mb(server.pid)
+
+        levels = []
+        for concurrency in [int(c) for c in args.levels.split(",")]:
+            print(f"Running {concurrency} concurrent session(s) for {args.duration:.0f}s...", flush=True)
+            levels.append(run_level(server, ws_url, concurrency, args.duration, args.timeout, args.shared_user))
+    finally:
+        stop_server(server)
+
+    saturation = find_saturation(levels, args.min_gain, args.latency_slo)
+    print()
+    print_report(levels, saturation, idle_rss)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"levels": levels, "saturation_concurrency": saturation, "idle_rss_mb": round(idle_rss, 1),
+                       "config": vars(args)}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
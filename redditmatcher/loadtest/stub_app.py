@@ -0,0 +1,27 @@
+"""
+Entry script for the load-test server:
+
+    streamlit run loadtest/stub_app.py
+
+Installs the stand-ins from loadtest/stubs.py in the server process, with the
+options given as JSON in LOADTEST_STUBS, then runs app.py unchanged. Streamlit
+runs this script once per page run; the stand-ins are installed only once.
+"""
+
+import os
+import sys
+import json
+import runpy
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from loadtest import stubs
+
+store_dir = stubs.install_once(**json.loads(os.getenv("LOADTEST_STUBS", "{}")))
+# app.py writes <username>_persona.txt to the working directory
+if os.getcwd() != store_dir:
+    os.chdir(store_dir)
+
+runpy.run_path(os.path.join(APP_DIR, "app.py"), run_name="__main__")
@@ -0,0 +1,192 @@
+"""
+Local stand-ins for Reddit, Gemini and People Data Labs used by the load test.
+
+Each stand-in sleeps for a configurable latency (with jitter) instead of
+calling the real service, so the app's own code paths run unchanged.
+"""
+
+import json
+import time
+import random
+import tempfile
+import threading
+
+import pandas as pd
+
+SAMPLE_SUBREDDITS = ["python", "learnprogramming", "datascience", "gaming", "AskReddit", "movies"]
+
+SAMPLE_PERSONA = {
+    "name": "Load Test User",
+    "age": "25-34",
+    "occupation": "Software developer",
+    "status": "Unknown",
+    "location": "Berlin, Germany",
+    "personality_traits": [{"trait": "Curious", "degree": 8, "citations": ["I wonder how this works"]}],
+    "motivations": [{"motivation": "Learning", "degree": 9, "citations": ["Trying to learn something new"]}],
+    "behaviour_habits": [{"habit": "Posts late at night", "citations": []}],
+    "frustrations": [{"frustration": "Slow builds", "citations": ["the build takes forever"]}],
+    "goals_needs": [{"goal_need": "Ship side projects", "citations": []}],
+    "summary_quote": "I just want things to work.",
+    "subreddits_active": SAMPLE_SUBREDDITS[:3],
+    "sentiment_tone": "Friendly",
+    "comment_karma": 1234,
+    "link_karma": 56,
+    "posts_per_week_comments": 3.2,
+    "posts_per_week_submissions": 0.4,
+    "top_comments": [],
+    "top_submissions": [],
+}
+
+def _sleep(latency, jitter):
+    if latency > 0:
+        time.sleep(latency * random.uniform(1 - jitter, 1 + jitter))
+
+class _Subreddit:
+    def __init__(self, name):
+        self.display_name = name
+
+class _Item:
+    def __init__(self, index, now):
+        self.body = f"Stand-in comment {index} about debugging, testing and shipping code. " * 3
+        self.title = f"Stand-in submission {index}"
+        self.selftext = "Some submission text for the load test. " * 5
+        self.url = f"https://www.reddit.com/r/python/comments/{index}"
+        self.score = random.randint(-5, 500)
+        self.subreddit = _Subreddit(random.choice(SAMPLE_SUBREDDITS))
+        self.created_utc = now - index * random.uniform(3600, 6 * 3600)
+        self.parent_id = random.choice(["t1_parent", "t3_post"])
+
+class _Listing:
+    def __init__(self, latency, jitter, count):
+        self.latency = latency
+        self.jitter = jitter
+        self.count = count
+
+    def new(self, limit=100):
+        # One simulated API page per listing call, like PRAW fetching 100 items
+        _sleep(self.latency, self.jitter)
+        now = time.time()
+        for index in range(min(limit or self.count, self.count)):
+            yield _Item(index, now)
+
+class _Redditor:
+    def __init__(self, name, latency, jitter, items):
+        _sleep(latency, jitter)
+        self.name = name
+        self.id = f"id_{name}"
+        self.comment_karma = SAMPLE_PERSONA["comment_karma"]
+        self.link_karma = SAMPLE_PERSONA["link_karma"]
+        self.created_utc = time.time() - 365 * 24 * 3600
+        self.icon_img = None
+        self.comments = _Listing(latency, jitter, items)
+        self.submissions = _Listing(latency, jitter, items // 4)
+
+class FakeReddit:
+    """Stand-in for praw.Reddit."""
+
+    def __init__(self, latency, jitter, items):
+        self.latency = latency
+        self.jitter = jitter
+        self.items = items
+
+    def redditor(self, name):
+        return _Redditor(name, self.latency, self.jitter, self.items)
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+class FakeGenerativeModel:
+    """Stand-in for google.generativeai.GenerativeModel returning a fixed persona."""
+
+    latency = 0.0
+    jitter = 0.0
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, *args, **kwargs):
+        _sleep(self.latency, self.jitter)
+        if "Topic Name:" in str(prompt):
+            return _Response("Programming Help")
+        if "delta" in str(prompt):
+            return _Response(json.dumps({"set": {}, "append": {}}))
+        return _Response("```json\n" + json.dumps(SAMPLE_PERSONA) + "\n```")
+
+class _PDLResponse:
+    status_code = 200
+    text = ""
+
+    def json(self):
+        return {"status": 200, "data": {"job_title": "Engineer", "job_company_name": "Example GmbH"}}
+
+class FakeRequests:
+    """Stand-in for the requests module as used by api.people_api."""
+
+    def __init__(self, latency, jitter):
+        self.latency = latency
+        self.jitter = jitter
+
+    def post(self, *args, **kwargs):
+        _sleep(min(self.latency, kwargs.get("timeout") or self.latency), self.jitter)
+        return _PDLResponse()
+
+def fake_topic_distribution(latency, jitter):
+    """Returns a stand-in for core.topic_modeling.get_topic_distribution."""
+    def get_topic_distribution(texts, use_keybert=False, deadline=None):
+        _sleep(latency, jitter)
+        if not texts:
+            return None, None
+        topics = [i % 3 - 1 for i in range(len(texts))]
+        topic_info = pd.DataFrame({
+            "Topic": [-1, 0, 1],
+            "Count": [topics.count(-1), topics.count(0), topics.count(1)],
+            "Name": ["Outlier Topic", "Programming Help", "Gaming Talk"],
+        })
+        topic_distr = pd.DataFrame({"Document": [t.get("body", "") for t in texts], "Topic": topics})
+        return topic_info, topic_distr
+    return get_topic_distribution
+
+def install(reddit_latency=0.5, gemini_latency=3.0, pdl_latency=2.0, topics_latency=1.0,
+            jitter=0.3, items=100, real_topics=False):
+    """
+    Patches the app's upstream clients with local stand-ins. Must be called
+    after the app's modules are importable and before the first app run.
+    Returns the temporary directory used for stored personas.
+    """
+    import google.generativeai as genai
+    import api.people_api as people_api
+    import core.persona_generator as persona_generator
+    import core.persona_store as persona_store
+    import core.pipeline as pipeline
+    import core.reddit_scraper as reddit_scraper
+
+    reddit_scraper.get_reddit_instance = lambda timeout=None: FakeReddit(reddit_latency, jitter, items)
+
+    FakeGenerativeModel.latency = gemini_latency
+    FakeGenerativeModel.jitter = jitter
+    genai.GenerativeModel = FakeGenerativeModel
+    persona_generator.GEMINI_API_KEY = "load-test"
+
+    people_api.PDL_API_KEY = "load-test"
+    people_api.requests = FakeRequests(pdl_latency, jitter)
+
+    if not real_topics:
+        pipeline.get_topic_distribution = fake_topic_distribution(topics_latency, jitter)
+
+    persona_store.PERSONA_STORE_DIR = tempfile.mkdtemp(prefix="persona-store-")
+    return persona_store.PERSONA_STORE_DIR
+
+_installed_dir = None
+_install_lock = threading.Lock()
+
+def install_once(**options):
+    """
+    install() for a long-running server, where the entry script runs once per
+    page run: the first call patches, later calls return the same directory.
+    """
+    global _installed_dir
+    with _install_lock:
+        if _installed_dir is None:
+            _installed_dir = install(**options)
+        return _installed_dir